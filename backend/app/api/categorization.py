@@ -1,53 +1,151 @@
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.security import get_current_user
+from app.domain.ml.registry import GLOBAL_SCOPE, user_scope
+from app.models.category import Category
+from app.models.user import User
+from app.schemas.categorization import (
+    BackCategorizationResponse,
+    CategoryPredictionResponse,
+    PredictBatchRequest,
+    PredictBatchResponse,
+    PredictionPrecisionResponse,
+    TrainingJobResponse,
+)
+from app.domain.services.back_categorization import BackCategorizationConflictError, back_categorization
 from app.domain.services.categorization_service import CategorizationService
+from app.domain.services.training_jobs import TrainingJobConflictError, training_jobs
 
 router = APIRouter()
 
 
-@router.post("/train")
+@router.post("/train", response_model=TrainingJobResponse, status_code=202)
 async def train_categorization_model(
-    db: Session = Depends(get_db)
+    personal: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Start training the ML categorization model on existing transactions
+    
+    Trains the shared global model on everyone's transactions, or with
+    personal=true the current user's own model on their transactions.
+    Training runs in a background worker process; poll
+    /jobs/{job_id} for progress and the resulting stats.
+    """
+    try:
+        return training_jobs.submit(current_user.id if personal else None)
+    except TrainingJobConflictError as exc:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(exc), "job_id": exc.job_id}
+        )
+
+
+@router.get("/jobs/{job_id}", response_model=TrainingJobResponse)
+async def get_training_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get status, progress, duration and result of a training job
+    """
+    job = training_jobs.get(job_id)
+    if not job or job["scope"] not in (GLOBAL_SCOPE, user_scope(current_user.id)):
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+
+@router.post("/back-categorize", response_model=BackCategorizationResponse, status_code=202)
+async def start_back_categorization(
+    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    restart: bool = False,
+    current_user: User = Depends(get_current_user)
 ):
     """
-    Train the ML categorization model on existing transactions
+    Categorize the current user's uncategorized expenses in the background
     
-    This will use all categorized transactions as training data
-    and build a TF-IDF based classifier.
+    Only predictions with at least min_confidence (default
+    BACK_CATEGORIZATION_MIN_CONFIDENCE) are applied. A stopped or
+    interrupted job resumes where it left off unless restart=true.
+    """
+    if min_confidence is None:
+        min_confidence = settings.BACK_CATEGORIZATION_MIN_CONFIDENCE
+    try:
+        return back_categorization.start(current_user.id, min_confidence, restart=restart)
+    except BackCategorizationConflictError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.get("/back-categorize", response_model=BackCategorizationResponse)
+async def get_back_categorization(current_user: User = Depends(get_current_user)):
+    """
+    Get progress and throughput of the current user's back-categorization
+    """
+    state = back_categorization.get(current_user.id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Back-categorization has not been started")
+    return state
+
+
+@router.delete("/back-categorize", response_model=BackCategorizationResponse, status_code=202)
+async def stop_back_categorization(current_user: User = Depends(get_current_user)):
+    """
+    Stop the current user's back-categorization after its current chunk
     """
-    service = CategorizationService(db)
-    result = service.train_ml_model()
-    return result
+    if not back_categorization.stop(current_user.id):
+        raise HTTPException(status_code=404, detail="Back-categorization is not running")
+    return back_categorization.get(current_user.id)
 
 
 @router.get("/stats")
 async def get_categorization_stats(
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
 ):
     """
     Get statistics about the categorization system
     
     Includes both rule-based and ML metrics
     """
-    service = CategorizationService(db)
+    service = CategorizationService(db, current_user.id)
     return service.get_categorization_stats()
 
 
+@router.get("/precision", response_model=List[PredictionPrecisionResponse])
+async def get_prediction_precision(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Precision of the current user's recorded predictions per source and model version
+    
+    Computed from the provenance stored on transactions and the user
+    corrections made since, without running the model.
+    """
+    service = CategorizationService(db, current_user.id)
+    return service.get_prediction_precision()
+
+
 @router.post("/predict")
 async def predict_category(
     description: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
 ):
     """
     Test category prediction for a given description
+    
+    Test predictions leave rule usage statistics untouched.
     """
-    service = CategorizationService(db)
-    category_id = service.predict_category(description)
+    service = CategorizationService(db, current_user.id)
+    category_id = service.predict_category(description, record_usage=False)
     
     if category_id:
-        from app.models.category import Category
         category = db.query(Category).filter(Category.id == category_id).first()
         return {
             "category_id": category_id,
@@ -58,3 +156,39 @@ async def predict_category(
             "category_id": None,
             "category_name": "Unable to predict"
         }
+
+
+
+@router.post("/predict-batch", response_model=PredictBatchResponse)
+async def predict_categories(
+    request: PredictBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Predict categories for many descriptions in one call
+    
+    Descriptions are vectorized and scored together; only the rows the
+    ML model could not resolve fall back to rule matching. Nothing is
+    applied, so rule usage statistics are left untouched.
+    """
+    service = CategorizationService(db, current_user.id)
+    category_ids = service.predict_categories(request.descriptions, record_usage=False)
+    
+    known_ids = {category_id for category_id in category_ids if category_id}
+    names = {}
+    if known_ids:
+        names = dict(
+            db.query(Category.id, Category.name).filter(Category.id.in_(known_ids)).all()
+        )
+    
+    return PredictBatchResponse(
+        predictions=[
+            CategoryPredictionResponse(
+                description=description,
+                category_id=category_id,
+                category_name=names.get(category_id) if category_id else "Unable to predict"
+            )
+            for description, category_id in zip(request.descriptions, category_ids)
+        ]
+    )
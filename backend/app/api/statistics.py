@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import date, datetime, time
-from typing import Optional
+from typing import Literal, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
+from app.domain.services.statistics_cache import statistics_cache
 from app.domain.services.statistics_service import StatisticsService
 
 router = APIRouter()
@@ -22,7 +24,13 @@ async def get_summary(
     service = StatisticsService(db)
     start_datetime = datetime.combine(start_date, time.min) if start_date else None
     end_datetime = datetime.combine(end_date, time.max) if end_date else None
-    return service.get_summary(current_user.id, start_datetime, end_datetime)
+    return statistics_cache.get_or_compute(
+        current_user.id,
+        current_user.data_version,
+        "summary",
+        {"start_date": start_date, "end_date": end_date},
+        lambda: service.get_summary(current_user.id, start_datetime, end_datetime)
+    )
 
 
 @router.get("/by-category")
@@ -36,18 +44,64 @@ async def get_by_category(
     service = StatisticsService(db)
     start_datetime = datetime.combine(start_date, time.min) if start_date else None
     end_datetime = datetime.combine(end_date, time.max) if end_date else None
-    return service.get_by_category(current_user.id, start_datetime, end_datetime)
+    return statistics_cache.get_or_compute(
+        current_user.id,
+        current_user.data_version,
+        "by-category",
+        {"start_date": start_date, "end_date": end_date},
+        lambda: service.get_by_category(current_user.id, start_datetime, end_datetime)
+    )
+
+
+@router.get("/by-category-tree")
+async def get_by_category_tree(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    parent_id: Optional[int] = None,
+    depth: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get spending per category including subcategories, optionally one level of the tree"""
+    service = StatisticsService(db)
+    start_datetime = datetime.combine(start_date, time.min) if start_date else None
+    end_datetime = datetime.combine(end_date, time.max) if end_date else None
+    return statistics_cache.get_or_compute(
+        current_user.id,
+        current_user.data_version,
+        "by-category-tree",
+        {"start_date": start_date, "end_date": end_date, "parent_id": parent_id, "depth": depth},
+        lambda: service.get_by_category_tree(current_user.id, start_datetime, end_datetime, parent_id, depth)
+    )
 
 
 @router.get("/trend")
 async def get_spending_trend(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    granularity: Literal["day", "week", "month", "quarter", "year"] = "month",
+    tz: str = "UTC",
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get monthly spending trend"""
+    """Get income and expense trend per day, week, month, quarter or year in the given time zone"""
+    try:
+        ZoneInfo(tz)
+    except (ValueError, ZoneInfoNotFoundError):
+        raise HTTPException(status_code=400, detail="Unknown time zone")
     service = StatisticsService(db)
     start_datetime = datetime.combine(start_date, time.min) if start_date else None
     end_datetime = datetime.combine(end_date, time.max) if end_date else None
-    return service.get_spending_trend(current_user.id, start_datetime, end_datetime)
+    return statistics_cache.get_or_compute(
+        current_user.id,
+        current_user.data_version,
+        "trend",
+        {"start_date": start_date, "end_date": end_date, "granularity": granularity, "tz": tz},
+        lambda: service.get_spending_trend(current_user.id, start_datetime, end_datetime, granularity, tz)
+    )
+
+
+@router.get("/cache")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Get statistics cache hit ratio and size in this process"""
+    return statistics_cache.get_stats()
@@ -42,6 +42,7 @@ async def get_transactions(
             transaction_type=t.transaction_type,
             category_id=t.category_id,
             category_name=t.category.name if t.category else None,
+            prediction_confidence=t.prediction_confidence,
             account_id=t.account_id,
             account_name=t.account.name if t.account else None,
             created_at=t.created_at,
@@ -71,6 +72,7 @@ async def get_transaction(
         transaction_type=transaction.transaction_type,
         category_id=transaction.category_id,
         category_name=transaction.category.name if transaction.category else None,
+        prediction_confidence=transaction.prediction_confidence,
         account_id=transaction.account_id,
         account_name=transaction.account.name if transaction.account else None,
         created_at=transaction.created_at,
@@ -99,6 +101,7 @@ async def create_transaction(
         transaction_type=created.transaction_type,
         category_id=created.category_id,
         category_name=created.category.name if created.category else None,
+        prediction_confidence=created.prediction_confidence,
         account_id=created.account_id,
         account_name=created.account.name if created.account else None,
         created_at=created.created_at,
@@ -130,6 +133,7 @@ async def update_transaction(
         transaction_type=transaction.transaction_type,
         category_id=transaction.category_id,
         category_name=transaction.category.name if transaction.category else None,
+        prediction_confidence=transaction.prediction_confidence,
         account_id=transaction.account_id,
         account_name=transaction.account.name if transaction.account else None,
         created_at=transaction.created_at,
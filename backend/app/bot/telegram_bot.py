@@ -413,7 +413,26 @@ class FinTrackBot:
             InlineKeyboardButton("Без категории", callback_data=f"cat-none:{transaction_id}")
         )
 
-        return InlineKeyboardMarkup(self._chunk_buttons(buttons))
+        rows = self._chunk_buttons(buttons)
+        suggestion = self._get_suggested_category(db, transaction_id)
+        if suggestion:
+            # One tap confirms the category predicted in the background
+            rows.insert(0, [
+                InlineKeyboardButton(
+                    f"✨ {suggestion.name}",
+                    callback_data=f"cat:{transaction_id}:{suggestion.id}"
+                )
+            ])
+        return InlineKeyboardMarkup(rows)
+
+    def _get_suggested_category(self, db: Session, transaction_id: int):
+        from app.models.category import Category
+        from app.models.transaction import Transaction
+
+        return db.query(Category).join(Transaction, Transaction.predicted_category_id == Category.id).filter(
+            Transaction.id == transaction_id,
+            Transaction.prediction_source != "other"
+        ).first()
 
     def _build_child_categories_keyboard(self, transaction_id: int, categories: list) -> InlineKeyboardMarkup:
         buttons = [
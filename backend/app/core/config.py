@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -23,6 +23,43 @@ class Settings(BaseSettings):
     # Categorization
     MIN_TRAINING_SAMPLES: int = 3
     SIMILARITY_THRESHOLD: float = 0.7
+    # Cosine similarity of hashed token features, on a lower scale than the
+    # SIMILARITY_THRESHOLD of rule matching; tuned with scripts/evaluate_categorization.py
+    ML_SIMILARITY_THRESHOLD: float = 0.1
+    # "centroid" scores against per-category means, "knn" votes among the KNN_K
+    # most similar labeled transactions
+    CATEGORIZER_MODE: Literal["centroid", "knn"] = "centroid"
+    KNN_K: int = 5
+    CATEGORIZER_HASH_FEATURES: int = 2 ** 18
+    CATEGORIZER_USER_HASH_FEATURES: int = 2 ** 16
+    CATEGORIZER_CHAR_NGRAMS: bool = False
+    CATEGORIZER_COMPACT_EVERY: int = 100
+    CATEGORIZER_KEEP_TRAINING_TEXT: bool = False
+    CATEGORIZER_TRAINING_CHUNK_SIZE: int = 5000
+    CATEGORIZER_TRAINING_WORKERS: int = 1
+    CATEGORIZER_MAX_CACHED_MODELS: int = 100
+    CATEGORIZER_MAX_CACHED_BYTES: int = 256 * 2 ** 20
+    PREDICTION_CACHE_SIZE: int = 10000
+    PREDICTION_CACHE_TTL_SECONDS: int = 3600
+    RULE_INDEX_CHECK_SECONDS: int = 30
+    RULE_USAGE_FLUSH_SECONDS: int = 30
+    # Nightly rule compaction: near-duplicates of the same category are merged,
+    # rules not corrected for RULE_PRUNE_MIN_AGE_DAYS are dropped below the floors
+    RULE_MERGE_SIMILARITY: float = 0.9
+    RULE_MIN_CONFIDENCE: float = 0.0
+    RULE_MIN_TIMES_APPLIED: int = 2
+    RULE_PRUNE_MIN_AGE_DAYS: int = 90
+    RULE_COMPACTION_CHUNK_SIZE: int = 500
+    # New expense transactions without a category are categorized in the background
+    AUTO_CATEGORIZATION_ENABLED: bool = True
+    AUTO_CATEGORIZATION_BATCH_SIZE: int = 100
+    AUTO_CATEGORIZATION_MAX_WAIT_SECONDS: float = 0.2
+    # Back-categorization of existing history only applies confident predictions
+    BACK_CATEGORIZATION_MIN_CONFIDENCE: float = 0.8
+    BACK_CATEGORIZATION_CHUNK_SIZE: int = 1000
+    
+    # Statistics responses are cached until the user's data changes
+    STATISTICS_CACHE_SIZE: int = 10000
     
     class Config:
         env_file = ".env"
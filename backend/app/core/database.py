@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 
@@ -17,3 +18,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def dialect_insert(db: Session):
+    """INSERT construct with ON CONFLICT support for the session's database"""
+    # SQLite is what the scripts run against
+    return sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
@@ -0,0 +1,151 @@
+"""
+Versioned, memory-mappable on-disk format for categorizer models
+
+Layout under a model directory:
+
+    CURRENT                 number of the active version
+    v<N>/header.json        format, model version, timestamps, feature-space hash
+    v<N>/<array>.npy        one plain .npy file per array, opened with mmap_mode
+    v<N>/corrections.log    corrections appended on top of version N
+
+A version directory is written under a temporary name and renamed into
+place before CURRENT is switched, so readers either see the previous
+complete version or the new one.
+"""
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from scipy import sparse
+
+ARTIFACT_FORMAT_VERSION = 1
+HEADER_FILE = 'header.json'
+CURRENT_FILE = 'CURRENT'
+CORRECTIONS_FILE = 'corrections.log'
+# Old versions kept around for processes still mapping them
+KEEP_VERSIONS = 2
+
+
+def read_current(root: Path) -> int:
+    """
+    Return the active version number, 0 if nothing was saved yet
+    """
+    try:
+        return int((root / CURRENT_FILE).read_text().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def version_dir(root: Path, version: int) -> Path:
+    return root / f'v{version}'
+
+
+def read_header(directory: Path) -> Optional[dict]:
+    try:
+        with open(directory / HEADER_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_version(root: Path, header: dict, arrays: Dict[str, np.ndarray]) -> int:
+    """
+    Write a complete new version and make it the active one
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=root, prefix='.v-'))
+    try:
+        for name, array in arrays.items():
+            with open(tmp_dir / f'{name}.npy', 'wb') as f:
+                np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+                f.flush()
+                os.fsync(f.fileno())
+
+        while True:
+            version = max([read_current(root), *_existing_versions(root)], default=0) + 1
+            header = {**header, 'format_version': ARTIFACT_FORMAT_VERSION, 'model_version': version}
+            with open(tmp_dir / HEADER_FILE, 'w', encoding='utf-8') as f:
+                json.dump(header, f, indent=2, sort_keys=True)
+            try:
+                os.rename(tmp_dir, version_dir(root, version))
+                break
+            except OSError:
+                # Another process claimed this version number first
+                if not version_dir(root, version).exists():
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _atomic_write_text(root / CURRENT_FILE, str(version))
+    _prune(root, version)
+    return version
+
+
+def load_arrays(directory: Path, names: Iterable[str], mmap_mode: Optional[str] = 'r') -> Dict[str, np.ndarray]:
+    """
+    Open arrays of a version, memory-mapped unless mmap_mode is None
+    """
+    return {
+        name: np.load(directory / f'{name}.npy', mmap_mode=mmap_mode, allow_pickle=False)
+        for name in names
+    }
+
+
+def csr_arrays(prefix: str, matrix: sparse.csr_matrix) -> Dict[str, np.ndarray]:
+    """
+    Split a CSR matrix into separately stored component arrays
+    """
+    return {
+        f'{prefix}.data': matrix.data,
+        f'{prefix}.indices': matrix.indices.astype(np.int32, copy=False),
+        f'{prefix}.indptr': matrix.indptr.astype(np.int32, copy=False),
+    }
+
+
+def csr_array_names(prefix: str) -> list:
+    return [f'{prefix}.data', f'{prefix}.indices', f'{prefix}.indptr']
+
+
+def csr_from_arrays(prefix: str, arrays: Dict[str, np.ndarray], shape: tuple) -> sparse.csr_matrix:
+    """
+    Rebuild a CSR matrix around stored arrays without copying them
+    """
+    return sparse.csr_matrix(
+        (arrays[f'{prefix}.data'], arrays[f'{prefix}.indices'], arrays[f'{prefix}.indptr']),
+        shape=shape,
+        copy=False
+    )
+
+
+def _existing_versions(root: Path) -> list:
+    versions = []
+    for path in root.glob('v*'):
+        try:
+            versions.append(int(path.name[1:]))
+        except ValueError:
+            continue
+    return versions
+
+
+def _prune(root: Path, current: int):
+    for version in _existing_versions(root):
+        if version <= current - KEEP_VERSIONS:
+            shutil.rmtree(version_dir(root, version), ignore_errors=True)
+
+
+def _atomic_write_text(path: Path, text: str):
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
@@ -1,36 +1,143 @@
 """
 Machine Learning categorization engine using TF-IDF and similarity matching
 """
-import pickle
-import re
-from typing import Optional, List, Dict, Tuple
+import fcntl
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, Optional, List, Dict, Tuple
 from pathlib import Path
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils.sparsefuncs_fast import inplace_csr_row_normalize_l2
+
+from app.domain.ml import artifact, text
+from app.domain.ml.training_store import TrainingStore
 
 from app.models.category import Category
 from app.models.transaction import Transaction
 from app.models.user_correction import UserCorrection
 
+# Bump whenever _preprocess_text changes, so saved models are retrained
+PREPROCESSING_VERSION = 2
+SCORING_MODES = ('centroid', 'knn')
+# Character n-grams catch inflected and misspelled words ("кофейня" vs "кофе")
+CHAR_NGRAM_RANGE = (3, 4)
+
 
 class MLCategorizer:
     """
     ML-based categorizer using TF-IDF vectorization
+    
+    Descriptions are hashed into a fixed feature space, so every category
+    keeps a running sum of its document vectors and a sample count. A user
+    correction only touches one category's sum and the document frequencies,
+    and is persisted as an appended log line instead of a full model rewrite.
+    
+    Sums live in a single float32 CSR matrix whose rows are keyed by
+    category_index; no training text is kept in memory, so model size tracks
+    categories and vocabulary rather than transaction history.
+    
+    In 'knn' mode the hashed vector of every labeled description is kept
+    as well, and a description is labeled by a majority vote of its k most
+    similar documents instead of the nearest category centroid. Corrected
+    documents are indexed in a small tail next to the main index, so a
+    correction stays O(document) there too.
     """
     
-    def __init__(self, min_samples: int = 3):
+    def __init__(
+        self,
+        min_samples: int = 3,
+        n_features: int = 2 ** 18,
+        compact_every: int = 100,
+        keep_training_text: bool = False,
+        model_path: Optional[Path] = None,
+        char_ngrams: bool = False,
+        mode: str = 'centroid',
+        knn_k: int = 5
+    ):
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unknown categorizer mode: {mode}")
         self.min_samples = min_samples
-        self.vectorizer = TfidfVectorizer(
-            max_features=100,
+        self.mode = mode
+        self.knn_k = knn_k
+        self.n_features = n_features
+        self.compact_every = compact_every
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
             ngram_range=(1, 2),
-            stop_words='english'
+            stop_words=sorted(text.STOP_WORDS),
+            lowercase=False,
+            alternate_sign=False,
+            norm='l2'
+        )
+        # Optional second hasher into the same feature space
+        self.char_vectorizer: Optional[HashingVectorizer] = (
+            HashingVectorizer(
+                n_features=n_features,
+                analyzer='char_wb',
+                ngram_range=CHAR_NGRAM_RANGE,
+                lowercase=False,
+                alternate_sign=False,
+                norm='l2'
+            )
+            if char_ngrams else None
         )
         self.is_trained = False
-        self.category_vectors: Dict[int, np.ndarray] = {}
-        self.category_descriptions: Dict[int, List[str]] = {}
-        self.model_path = Path("app/domain/ml/models")
+        # Running state in the hashed feature space: row i of category_sums
+        # belongs to category_index[i] and has category_counts[i] samples
+        self.category_index = np.empty(0, dtype=np.int64)
+        self.category_counts = np.empty(0, dtype=np.int64)
+        self.category_sums = sparse.csr_matrix((0, n_features), dtype=np.float32)
+        self._rows: Dict[int, int] = {}
+        # Corrections not yet folded into category_sums, as COO triplets
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self.document_frequency = np.zeros(n_features, dtype=np.int32)
+        self.num_documents = 0
+        # IDF weights are refreshed on training and compaction only, so a
+        # correction never has to rescale other categories
+        self.idf = np.ones(n_features, dtype=np.float32)
+        # Scoring matrix of L2-normalized centroids, stored feature-major
+        # (features x categories) so a query only reads the rows of its own
+        # non-zero features; column j belongs to category_ids[j]
+        self.category_ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.centroid_matrix: sparse.csr_matrix = sparse.csr_matrix((n_features, 0), dtype=np.float32)
+        # kNN mode only: raw document vectors with their labels, plus an
+        # inverted index (features x documents) of the IDF-weighted,
+        # normalized vectors of active categories, so a query only touches
+        # the postings of its own features
+        self.documents = sparse.csr_matrix((0, n_features), dtype=np.float32)
+        self.document_labels = np.empty(0, dtype=np.int64)
+        # Corrected documents not yet stacked into documents; the first
+        # _tail_indexed of them are in the tail index
+        self._pending_documents: List[Tuple[int, sparse.csr_matrix]] = []
+        self._tail_indexed = 0
+        self.knn_labels = np.empty(0, dtype=np.int64)
+        self.knn_matrix = sparse.csr_matrix((n_features, 0), dtype=np.float32)
+        # Tail index of corrected documents, weighted with the IDF of the
+        # last full build and scored after knn_matrix; merged on compaction
+        self.knn_tail_labels = np.empty(0, dtype=np.int64)
+        self.knn_tail_matrix = sparse.csr_matrix((n_features, 0), dtype=np.float32)
+        self._knn_scoring_labels = self.knn_labels
+        # A category became active, so its older documents need indexing
+        self._knn_stale = False
+        self._matrix_dirty = False
+        self.corrections_since_compaction = 0
+        self.model_version = 0
+        self.trained_at: Optional[str] = None
+        # Bytes of the active version's correction log already applied
+        self._log_offset = 0
+        # (version, log size) of the files this instance reflects
+        self.loaded_signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()
+        self.model_path = model_path or Path("app/domain/ml/models")
         self.model_path.mkdir(parents=True, exist_ok=True)
+        self.training_store: Optional[TrainingStore] = (
+            TrainingStore(self.model_path / 'training.jsonl') if keep_training_text else None
+        )
     
     def train(self, transactions: List[Transaction]):
         """
@@ -39,180 +146,725 @@ class MLCategorizer:
         if len(transactions) < self.min_samples:
             return False
         
-        # Group transactions by category
-        category_data: Dict[int, List[str]] = {}
+        return self.train_stream([
+            [(transaction.description, transaction.category_id) for transaction in transactions]
+        ])
+    
+    def train_stream(self, chunks: Iterable[List[Tuple[str, Optional[int]]]]) -> bool:
+        """
+        Train from chunks of (description, category_id) rows
+        
+        Each chunk is hashed and folded into the per-category sums before
+        the next one is read, so peak memory depends on the chunk size, not
+        on the number of rows. Categories below min_samples keep their sums
+        but stay out of scoring until corrections bring them over.
+        """
+        rows_of: Dict[int, int] = {}
+        counts = np.zeros(0, dtype=np.int64)
+        sums = sparse.csr_matrix((0, self.n_features), dtype=np.float32)
+        document_frequency = np.zeros(self.n_features, dtype=np.int64)
+        num_documents = 0
+        document_chunks: List[sparse.csr_matrix] = []
+        label_chunks: List[np.ndarray] = []
+        store_writer = self.training_store.rewrite() if self.training_store else None
         
-        for transaction in transactions:
-            if transaction.category_id:
-                if transaction.category_id not in category_data:
-                    category_data[transaction.category_id] = []
-                category_data[transaction.category_id].append(
-                    self._preprocess_text(transaction.description)
+        try:
+            for chunk in chunks:
+                labeled = [
+                    (category_id, self._preprocess_text(description))
+                    for description, category_id in chunk
+                    if category_id
+                ]
+                if not labeled:
+                    continue
+                
+                rows = np.fromiter(
+                    (rows_of.setdefault(category_id, len(rows_of)) for category_id, _ in labeled),
+                    dtype=np.int64,
+                    count=len(labeled)
+                )
+                vectors = self._transform([description for _, description in labeled])
+                
+                # Per-category sums as one sparse product: (categories x docs) @ (docs x features)
+                membership = sparse.csr_matrix(
+                    (np.ones(len(rows), dtype=np.float32), (rows, np.arange(len(rows)))),
+                    shape=(len(rows_of), len(rows))
+                )
+                sums.resize((len(rows_of), self.n_features))
+                sums = sparse.csr_matrix(sums + membership @ vectors, dtype=np.float32)
+                counts = np.bincount(rows, minlength=len(rows_of)) + np.pad(
+                    counts, (0, len(rows_of) - len(counts))
                 )
+                document_frequency += np.bincount(vectors.indices, minlength=self.n_features)
+                num_documents += len(labeled)
+                if self.mode == 'knn':
+                    document_chunks.append(vectors)
+                    label_chunks.append(self._labels_of(labeled))
+                
+                if store_writer:
+                    for category_id, description in labeled:
+                        store_writer.write(category_id, description)
+            
+            if not (counts >= self.min_samples).any():
+                return False
+            
+            with self._lock:
+                self._reset_state()
+                # rows_of hands out rows in insertion order
+                self.category_index = np.fromiter(rows_of.keys(), dtype=np.int64, count=len(rows_of))
+                self.category_counts = counts
+                self.category_sums = sums
+                self._rows = dict(rows_of)
+                self.document_frequency = document_frequency.astype(np.int32)
+                self.num_documents = num_documents
+                if document_chunks:
+                    self.documents = sparse.vstack(document_chunks, format='csr', dtype=np.float32)
+                    self.document_labels = np.concatenate(label_chunks)
+                
+                self._refresh_idf()
+                self._build_scoring_matrices()
+                self.is_trained = len(self.category_ids) > 0
+                self.trained_at = datetime.utcnow().isoformat()
+                self._save_model()
+            
+            if store_writer:
+                store_writer.commit()
+                store_writer = None
+            return True
+        finally:
+            if store_writer:
+                store_writer.abort()
+    
+    def predict(self, description: str, threshold: float = 0.3) -> Optional[Tuple[int, float]]:
+        """
+        Predict category for a description
+        Returns: (category_id, confidence) or None
+        """
+        ranked = self.predict_top_k(description, k=1)
+        if not ranked:
+            return None
         
-        # Filter categories with enough samples
-        valid_categories = {
-            cat_id: descriptions 
-            for cat_id, descriptions in category_data.items() 
-            if len(descriptions) >= self.min_samples
-        }
+        best_category, best_score = ranked[0]
         
-        if not valid_categories:
-            return False
+        # Only return if confidence is above threshold
+        if best_score > 0.0 and best_score >= threshold:
+            return (best_category, best_score)
         
-        # Prepare training data
-        all_descriptions = []
-        for descriptions in valid_categories.values():
-            all_descriptions.extend(descriptions)
+        return None
+    
+    def predict_top_k(self, description: str, k: int = 3) -> List[Tuple[int, float]]:
+        """
+        Rank categories by cosine similarity to a description
+        Returns: up to k (category_id, score) pairs, best first
+        """
+        labels, matrices = self._scoring_state()
+        if not self.is_trained or len(labels) == 0 or k <= 0:
+            return []
         
-        # Fit vectorizer
-        self.vectorizer.fit(all_descriptions)
+        vector = self._vectorize([description])
+        if vector.nnz == 0:
+            return []
+        if self.mode == 'knn':
+            neighbours = self._score(vector, matrices)
+            return self._vote(labels[neighbours.indices], neighbours.data)[:k]
         
-        # Create category vectors (mean of all transaction vectors in category)
-        self.category_vectors = {}
-        self.category_descriptions = valid_categories
+        # Centroids are pre-normalized, so one vector-matrix product
+        # yields cosine similarity against every category at once
+        scores = self._score(vector, matrices).toarray().ravel()
+        # Like the knn votes, categories sharing no features are not candidates
+        candidates = np.flatnonzero(scores > 0.0)
+        category_ids, scores = labels[candidates], scores[candidates]
         
-        for cat_id, descriptions in valid_categories.items():
-            vectors = self.vectorizer.transform(descriptions)
-            mean_vector = np.mean(vectors.toarray(), axis=0)
-            self.category_vectors[cat_id] = mean_vector
+        k = min(k, scores.shape[0])
+        if k == 0:
+            return []
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
         
-        self.is_trained = True
-        self._save_model()
-        return True
+        return [(int(category_ids[i]), float(scores[i])) for i in top]
     
-    def predict(self, description: str, threshold: float = 0.3) -> Optional[Tuple[int, float]]:
+    def predict_batch(
+        self,
+        descriptions: List[str],
+        threshold: float = 0.3
+    ) -> List[Optional[Tuple[int, float]]]:
         """
-        Predict category for a description
-        Returns: (category_id, confidence) or None
+        Predict categories for many descriptions at once
+        Returns: one (category_id, confidence) or None per description, in order
         """
-        if not self.is_trained or not self.category_vectors:
-            return None
+        if not descriptions:
+            return []
+        labels, matrices = self._scoring_state()
+        if not self.is_trained or len(labels) == 0:
+            return [None] * len(descriptions)
         
-        # Preprocess and vectorize
-        preprocessed = self._preprocess_text(description)
-        vector = self.vectorizer.transform([preprocessed]).toarray()[0]
+        # One sparse transform for the whole list, one product for all scores
+        vectors = self._vectorize(descriptions)
+        if self.mode == 'knn':
+            neighbours = self._score(vectors, matrices)
+            results = []
+            for start, end in zip(neighbours.indptr[:-1], neighbours.indptr[1:]):
+                ranked = self._vote(
+                    labels[neighbours.indices[start:end]],
+                    neighbours.data[start:end]
+                )
+                best = ranked[0] if ranked else None
+                results.append(best if best and best[1] > 0.0 and best[1] >= threshold else None)
+            return results
         
-        # Calculate similarity with each category
-        best_category = None
-        best_score = 0.0
+        category_ids = labels
+        scores = self._score(vectors, matrices).toarray()
         
-        for cat_id, cat_vector in self.category_vectors.items():
-            similarity = cosine_similarity(
-                vector.reshape(1, -1), 
-                cat_vector.reshape(1, -1)
-            )[0][0]
-            
-            if similarity > best_score:
-                best_score = similarity
-                best_category = cat_id
-        
-        # Only return if confidence is above threshold
-        if best_score >= threshold:
-            return (best_category, float(best_score))
+        best = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(len(descriptions)), best]
         
-        return None
+        return [
+            (int(category_ids[index]), float(score))
+            if score > 0.0 and score >= threshold else None
+            for index, score in zip(best, best_scores)
+        ]
     
     def update_with_correction(self, description: str, category_id: int):
         """
         Update the model with a user correction
         """
         preprocessed = self._preprocess_text(description)
+        with self._lock:
+            if not self.model_version:
+                # Corrections are logged against a saved version
+                self._save_model()
+            self._log_correction(preprocessed, category_id)
+            if self.training_store:
+                self.training_store.append(category_id, preprocessed)
+            
+            self.corrections_since_compaction += 1
+            if self.corrections_since_compaction >= self.compact_every:
+                self.compact()
+    
+    def compact(self):
+        """
+        Fold logged corrections into a new version with an empty log
+        """
+        with self._lock:
+            if not self.model_version:
+                self._refresh_idf()
+                self._build_scoring_matrices()
+                self._save_model()
+                return
+            
+            # Holding the log lock keeps other processes from appending to
+            # the version being superseded
+            with self._locked_log() as log:
+                self._apply_log_lines(log)
+                self._refresh_idf()
+                self._build_scoring_matrices()
+                self._save_model()
+    
+    def _apply_correction(self, preprocessed: str, category_id: int):
+        """
+        Add one document to a category's running sum: O(document)
+        """
+        vector = self._transform([preprocessed])
+        row = self._row_for(category_id)
         
-        # Add to category descriptions
-        if category_id not in self.category_descriptions:
-            self.category_descriptions[category_id] = []
-        self.category_descriptions[category_id].append(preprocessed)
+        self._pending.append((
+            np.full(vector.nnz, row, dtype=np.int32),
+            vector.indices.astype(np.int32),
+            vector.data.astype(np.float32)
+        ))
+        self.category_counts[row] += 1
+        self.document_frequency[vector.indices] += 1
+        self.num_documents += 1
+        if self.mode == 'knn':
+            self._pending_documents.append((category_id, vector))
         
-        # Retrain if we have enough samples
-        if len(self.category_descriptions[category_id]) >= self.min_samples:
-            self._retrain_category(category_id)
+        if self.category_counts[row] >= self.min_samples:
+            if self.category_counts[row] == self.min_samples:
+                # Just became active: its earlier documents were never indexed
+                self._knn_stale = True
+            self._matrix_dirty = True
+            self.is_trained = True
     
-    def _retrain_category(self, category_id: int):
+    def _row_for(self, category_id: int) -> int:
         """
-        Retrain vector for a specific category
+        Return the sums row of a category, appending an empty row for a new one
         """
-        if category_id not in self.category_descriptions:
+        row = self._rows.get(category_id)
+        if row is None:
+            row = len(self.category_index)
+            self.category_index = np.append(self.category_index, category_id)
+            self.category_counts = np.append(self.category_counts, 0)
+            self.category_sums.resize((row + 1, self.n_features))
+            self._rows[category_id] = row
+        return row
+    
+    def _fold_pending(self):
+        """
+        Add buffered correction vectors into category_sums in one sparse sum
+        """
+        if not self._pending:
             return
-        
-        descriptions = self.category_descriptions[category_id]
-        if len(descriptions) < self.min_samples:
+        rows, cols, values = (np.concatenate(parts) for parts in zip(*self._pending))
+        delta = sparse.csr_matrix(
+            (values, (rows, cols)),
+            shape=self.category_sums.shape,
+            dtype=np.float32
+        )
+        self.category_sums = sparse.csr_matrix(self.category_sums + delta, dtype=np.float32)
+        self._pending = []
+    
+    def _fold_pending_documents(self):
+        """
+        Stack buffered corrected documents onto the stored kNN documents: O(all documents)
+        """
+        if not self._pending_documents:
             return
+        labels, vectors = zip(*self._pending_documents)
+        self.documents = sparse.vstack(
+            [self.documents, *vectors], format='csr', dtype=np.float32
+        )
+        self.document_labels = np.concatenate([
+            self.document_labels, np.array(labels, dtype=np.int64)
+        ])
+        self._pending_documents = []
+        self._tail_indexed = 0
+    
+    def _vectorize(self, descriptions: List[str]) -> sparse.csr_matrix:
+        """
+        Hash descriptions, apply IDF weights and L2-normalize rows
+        """
+        preprocessed = [self._preprocess_text(description) for description in descriptions]
+        vectors = self._transform(preprocessed)
+        inplace_csr_row_normalize_l2(self._apply_idf(vectors))
+        return vectors
+    
+    def _apply_idf(self, vectors: sparse.csr_matrix) -> sparse.csr_matrix:
+        """
+        Scale stored entries by their column's IDF weight in place
+        """
+        vectors.data *= self.idf[vectors.indices]
+        return vectors
+    
+    def _scoring_state(self) -> Tuple[np.ndarray, List[sparse.csr_matrix]]:
+        """
+        Return the labels and feature-major matrices scored against, refreshed after corrections
         
-        # Refit vectorizer with all current descriptions
-        all_descriptions = []
-        for desc_list in self.category_descriptions.values():
-            all_descriptions.extend(desc_list)
+        Labels are category ids in centroid mode and document labels in kNN
+        mode, where the tail index follows the main one.
+        """
+        with self._lock:
+            if self._matrix_dirty:
+                self._refresh_scoring_matrices()
+            if self.mode == 'knn':
+                if len(self.knn_tail_labels):
+                    return self._knn_scoring_labels, [self.knn_matrix, self.knn_tail_matrix]
+                return self.knn_labels, [self.knn_matrix]
+            return self.category_ids, [self.centroid_matrix]
+    
+    @staticmethod
+    def _score(vectors: sparse.csr_matrix, matrices: List[sparse.csr_matrix]) -> sparse.csr_matrix:
+        """
+        Similarities of each vector to the columns of every matrix, side by side
+        """
+        products = [vectors @ matrix for matrix in matrices]
+        return products[0] if len(products) == 1 else sparse.hstack(products, format='csr')
+    
+    def _refresh_idf(self):
+        """
+        Recompute smoothed IDF weights from document frequencies
+        """
+        self.idf = (np.log(
+            (1.0 + self.num_documents) / (1.0 + self.document_frequency)
+        ) + 1.0).astype(np.float32)
+    
+    def _refresh_scoring_matrices(self):
+        """
+        Bring the scoring matrices up to date with corrections, without refreshing IDF
+        
+        In kNN mode only the new documents are weighted and appended to the
+        tail index, unless a category became active and the whole index has
+        to be rebuilt. Category sums are not scored there, so their buffered
+        corrections wait for the next full build.
+        """
+        if self.mode != 'knn' or self._knn_stale:
+            self._build_scoring_matrices()
+            return
+        self._matrix_dirty = False
+        self._index_tail()
+    
+    def _index_tail(self):
+        """
+        Append corrected documents of active categories to the tail index: O(tail)
+        """
+        new = self._pending_documents[self._tail_indexed:]
+        self._tail_indexed = len(self._pending_documents)
+        if not new:
+            return
+        labels = np.fromiter((label for label, _ in new), dtype=np.int64, count=len(new))
+        indexed = np.isin(labels, self.category_ids)
+        if not indexed.any():
+            return
+        # Row selection copies, so weighting never touches the raw documents
+        documents = self._apply_idf(
+            sparse.vstack([vector for _, vector in new], format='csr', dtype=np.float32)[indexed]
+        )
+        inplace_csr_row_normalize_l2(documents)
+        self.knn_tail_labels = np.concatenate([self.knn_tail_labels, labels[indexed]])
+        self.knn_tail_matrix = sparse.hstack(
+            [self.knn_tail_matrix, documents.T], format='csr', dtype=np.float32
+        )
+        self._knn_scoring_labels = np.concatenate([self.knn_labels, self.knn_tail_labels])
+    
+    def _build_scoring_matrices(self):
+        """
+        Stack category sums into one L2-normalized scoring matrix
+
+        In kNN mode also rebuilds the inverted document index from every
+        document, merging the tail.
+        """
+        self._fold_pending()
+        self._fold_pending_documents()
+        self._matrix_dirty = False
         
-        self.vectorizer.fit(all_descriptions)
+        # Mean and sum differ only by scale, which normalization removes;
+        # row selection copies, so scaling never touches category_sums
+        active = self.category_counts >= self.min_samples
+        centroids = self._apply_idf(self.category_sums[active])
+        inplace_csr_row_normalize_l2(centroids)
+        self.category_ids = self.category_index[active]
+        self.centroid_matrix = sparse.csr_matrix(centroids.T, dtype=np.float32)
         
-        # Update category vector
-        vectors = self.vectorizer.transform(descriptions)
-        mean_vector = np.mean(vectors.toarray(), axis=0)
-        self.category_vectors[category_id] = mean_vector
+        if self.mode == 'knn':
+            indexed = np.isin(self.document_labels, self.category_ids)
+            documents = self._apply_idf(self.documents[indexed])
+            inplace_csr_row_normalize_l2(documents)
+            self.knn_labels = self.document_labels[indexed]
+            self.knn_matrix = sparse.csr_matrix(documents.T, dtype=np.float32)
+        self._reset_tail()
+    
+    def _reset_tail(self):
+        self.knn_tail_labels = np.empty(0, dtype=np.int64)
+        self.knn_tail_matrix = sparse.csr_matrix((self.n_features, 0), dtype=np.float32)
+        self._knn_scoring_labels = self.knn_labels
+        self._knn_stale = False
+    
+    def _vote(self, labels: np.ndarray, similarities: np.ndarray) -> List[Tuple[int, float]]:
+        """
+        Rank labels of the k most similar documents by vote count
+        Returns: (category_id, best similarity) pairs, ties broken by similarity
+        """
+        if len(similarities) > self.knn_k:
+            top = np.argpartition(-similarities, self.knn_k - 1)[:self.knn_k]
+            labels, similarities = labels[top], similarities[top]
         
-        self.is_trained = True
-        self._save_model()
+        votes: Dict[int, List[float]] = {}
+        for label, similarity in zip(labels.tolist(), similarities.tolist()):
+            if similarity > 0.0:
+                votes.setdefault(label, []).append(similarity)
+        ranked = sorted(votes.items(), key=lambda item: (len(item[1]), max(item[1])), reverse=True)
+        return [(label, max(scores)) for label, scores in ranked]
+    
+    @staticmethod
+    def _labels_of(labeled: List[Tuple[int, str]]) -> np.ndarray:
+        return np.fromiter((category_id for category_id, _ in labeled), dtype=np.int64, count=len(labeled))
     
-    def _preprocess_text(self, text: str) -> str:
+    def _reset_state(self):
+        self.category_index = np.empty(0, dtype=np.int64)
+        self.category_counts = np.empty(0, dtype=np.int64)
+        self.category_sums = sparse.csr_matrix((0, self.n_features), dtype=np.float32)
+        self._rows = {}
+        self._pending = []
+        self.documents = sparse.csr_matrix((0, self.n_features), dtype=np.float32)
+        self.document_labels = np.empty(0, dtype=np.int64)
+        self._pending_documents = []
+        self._tail_indexed = 0
+        self._reset_tail()
+        self.document_frequency = np.zeros(self.n_features, dtype=np.int32)
+        self.num_documents = 0
+        self._log_offset = 0
+        self.corrections_since_compaction = 0
+    
+    def _preprocess_text(self, description: str) -> str:
         """
         Preprocess text for vectorization
         """
-        # Convert to lowercase
-        text = text.lower()
-        # Remove special characters but keep spaces
-        text = re.sub(r'[^a-z0-9\s]', '', text)
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        return text
+        return text.normalize(description)
     
-    def _save_model(self):
+    def _transform(self, preprocessed: List[str]) -> sparse.csr_matrix:
+        """
+        Hash preprocessed descriptions into float32 feature vectors
+        """
+        vectors = self.vectorizer.transform(preprocessed)
+        if self.char_vectorizer is not None:
+            vectors = vectors + self.char_vectorizer.transform(preprocessed)
+        return vectors.astype(np.float32)
+    
+    def feature_space_hash(self) -> str:
         """
-        Save the trained model to disk
+        Fingerprint of everything that decides where a description lands in feature space
         """
-        model_data = {
-            'vectorizer': self.vectorizer,
-            'category_vectors': self.category_vectors,
-            'category_descriptions': self.category_descriptions,
-            'is_trained': self.is_trained
+        params = {
+            'hasher': type(self.vectorizer).__name__,
+            'n_features': self.n_features,
+            'ngram_range': list(self.vectorizer.ngram_range),
+            'stop_words': self.vectorizer.stop_words,
+            'char_ngrams': list(CHAR_NGRAM_RANGE) if self.char_vectorizer is not None else None,
+            'alternate_sign': self.vectorizer.alternate_sign,
+            'norm': self.vectorizer.norm,
+            'preprocessing': PREPROCESSING_VERSION,
         }
+        encoded = json.dumps(params, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()[:16]
+    
+    def read_version(self) -> int:
+        """
+        Read the active on-disk model version, 0 if no model was ever saved
+        """
+        return artifact.read_current(self.model_path)
+    
+    def disk_signature(self) -> Tuple[int, int]:
+        """
+        Cheap fingerprint of the on-disk model: active version and its correction log size
+        """
+        version = self.read_version()
+        try:
+            log_size = (artifact.version_dir(self.model_path, version) / artifact.CORRECTIONS_FILE).stat().st_size
+        except OSError:
+            log_size = 0
+        return (version, log_size)
+    
+    @property
+    def _corrections_file(self) -> Path:
+        return artifact.version_dir(self.model_path, self.model_version) / artifact.CORRECTIONS_FILE
+    
+    @contextmanager
+    def _locked_log(self) -> Iterator[BinaryIO]:
+        """
+        Open the active version's correction log under an exclusive lock
+        """
+        with open(self._corrections_file, 'ab+') as log:
+            fcntl.flock(log, fcntl.LOCK_EX)
+            yield log
+    
+    def _log_correction(self, preprocessed: str, category_id: int):
+        """
+        Apply a correction and persist it as one appended log line
+        """
+        record = json.dumps({'description': preprocessed, 'category_id': category_id})
+        for _ in range(3):
+            with self._locked_log() as log:
+                if self.read_version() == self.model_version:
+                    # Apply lines other processes appended first, so our
+                    # offset and a later compaction include them
+                    self._apply_log_lines(log)
+                    self._apply_correction(preprocessed, category_id)
+                    log.write(record.encode('utf-8') + b'\n')
+                    log.flush()
+                    self._log_offset = log.tell()
+                    self.loaded_signature = self.disk_signature()
+                    return
+            # Another process compacted into a newer version meanwhile
+            self.load_model()
         
-        model_file = self.model_path / 'categorizer.pkl'
-        with open(model_file, 'wb') as f:
-            pickle.dump(model_data, f)
+        # Could not catch up with the active version; keep the correction in memory
+        self._apply_correction(preprocessed, category_id)
     
-    def load_model(self) -> bool:
+    def refresh_corrections(self):
+        """
+        Apply correction lines appended to the active version's log since last read
+        """
+        with self._lock:
+            if not self.model_version or not self._corrections_file.exists():
+                return
+            with open(self._corrections_file, 'rb') as log:
+                self._apply_log_lines(log)
+            self.loaded_signature = self.disk_signature()
+    
+    def _apply_log_lines(self, log: BinaryIO):
+        """
+        Apply complete log lines after the stored offset
+        """
+        log.seek(self._log_offset)
+        while True:
+            line = log.readline()
+            if not line.endswith(b'\n'):
+                # Nothing left, or an append still in flight
+                break
+            self._log_offset = log.tell()
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self._apply_correction(record['description'], record['category_id'])
+            self.corrections_since_compaction += 1
+    
+    def _save_model(self):
         """
-        Load a trained model from disk
+        Save the trained model to disk as a new version
         """
-        model_file = self.model_path / 'categorizer.pkl'
+        # The tail index and buffered sums are not saved: merge them in
+        if self._matrix_dirty or self._pending or self._pending_documents:
+            self._build_scoring_matrices()
         
-        if not model_file.exists():
-            return False
+        header = {
+            'trained_at': self.trained_at,
+            'saved_at': datetime.utcnow().isoformat(),
+            'feature_space_hash': self.feature_space_hash(),
+            'n_features': self.n_features,
+            'min_samples': self.min_samples,
+            'num_documents': self.num_documents,
+            'num_categories': len(self.category_index),
+            'num_active_categories': len(self.category_ids),
+            'mode': self.mode,
+        }
+        arrays = {
+            'category_index': self.category_index,
+            'category_counts': self.category_counts,
+            'category_ids': self.category_ids,
+            'document_frequency': self.document_frequency,
+            'idf': self.idf,
+            **artifact.csr_arrays('sums', self.category_sums),
+            **artifact.csr_arrays('centroids', self.centroid_matrix),
+        }
+        if self.mode == 'knn':
+            arrays.update({
+                'document_labels': self.document_labels,
+                'knn_labels': self.knn_labels,
+                **artifact.csr_arrays('documents', self.documents),
+                **artifact.csr_arrays('knn', self.knn_matrix),
+            })
         
-        try:
-            with open(model_file, 'rb') as f:
-                model_data = pickle.load(f)
+        # The new version starts with an empty correction log: everything
+        # logged so far is folded into its arrays
+        self.model_version = artifact.write_version(self.model_path, header, arrays)
+        self._log_offset = 0
+        self.corrections_since_compaction = 0
+        self.loaded_signature = self.disk_signature()
+    
+    def load_model(self) -> bool:
+        """
+        Load the active model version from disk, memory-mapping its arrays
+        """
+        with self._lock:
+            # Taken before reading, so a save racing with this load is
+            # noticed as a newer signature on the next check
+            self.loaded_signature = self.disk_signature()
+            version = self.loaded_signature[0]
+            if not version:
+                return False
             
-            self.vectorizer = model_data['vectorizer']
-            self.category_vectors = model_data['category_vectors']
-            self.category_descriptions = model_data['category_descriptions']
-            self.is_trained = model_data['is_trained']
+            directory = artifact.version_dir(self.model_path, version)
+            header = artifact.read_header(directory)
+            # Models hashed with different parameters live in a different
+            # feature space and have to be retrained
+            if (
+                not header
+                or header.get('format_version') != artifact.ARTIFACT_FORMAT_VERSION
+                or header.get('feature_space_hash') != self.feature_space_hash()
+                or header.get('mode', 'centroid') != self.mode
+            ):
+                return False
             
-            return True
-        except Exception:
-            return False
+            try:
+                # Read-only pages are shared by every process mapping this
+                # version; arrays mutated by corrections are copy-on-write
+                arrays = artifact.load_arrays(directory, [
+                    'category_index',
+                    'category_ids',
+                    'idf',
+                    *artifact.csr_array_names('sums'),
+                    *artifact.csr_array_names('centroids'),
+                    *(self._knn_array_names() if self.mode == 'knn' else []),
+                ])
+                arrays.update(artifact.load_arrays(
+                    directory,
+                    ['category_counts', 'document_frequency'],
+                    mmap_mode='c'
+                ))
+            except (OSError, ValueError):
+                return False
+            
+            self._reset_state()
+            self.category_index = arrays['category_index']
+            self.category_counts = arrays['category_counts']
+            self.category_sums = artifact.csr_from_arrays(
+                'sums', arrays, (len(self.category_index), self.n_features)
+            )
+            self._rows = {int(cat_id): row for row, cat_id in enumerate(self.category_index)}
+            self.document_frequency = arrays['document_frequency']
+            self.num_documents = header['num_documents']
+            self.idf = arrays['idf']
+            self.category_ids = arrays['category_ids']
+            self.centroid_matrix = artifact.csr_from_arrays(
+                'centroids', arrays, (self.n_features, len(self.category_ids))
+            )
+            if self.mode == 'knn':
+                self.document_labels = arrays['document_labels']
+                self.documents = artifact.csr_from_arrays(
+                    'documents', arrays, (len(self.document_labels), self.n_features)
+                )
+                self.knn_labels = arrays['knn_labels']
+                self.knn_matrix = artifact.csr_from_arrays(
+                    'knn', arrays, (self.n_features, len(self.knn_labels))
+                )
+            self._matrix_dirty = False
+            self.trained_at = header.get('trained_at')
+            self.model_version = version
+            
+            self.refresh_corrections()
+            if self._matrix_dirty:
+                self._build_scoring_matrices()
+            self.is_trained = len(self.category_ids) > 0
+            
+            return self.is_trained
+    
+    @staticmethod
+    def _knn_array_names() -> List[str]:
+        return [
+            'document_labels',
+            'knn_labels',
+            *artifact.csr_array_names('documents'),
+            *artifact.csr_array_names('knn'),
+        ]
+    
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate resident size of the model arrays
+        """
+        def csr_bytes(matrix: sparse.csr_matrix) -> int:
+            return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        
+        return (
+            csr_bytes(self.category_sums)
+            + csr_bytes(self.centroid_matrix)
+            + self.category_index.nbytes
+            + self.category_counts.nbytes
+            + self.document_frequency.nbytes
+            + self.idf.nbytes
+            + csr_bytes(self.documents)
+            + self.document_labels.nbytes
+            + csr_bytes(self.knn_matrix)
+            + self.knn_labels.nbytes
+            + csr_bytes(self.knn_tail_matrix)
+            + self.knn_tail_labels.nbytes
+        )
     
     def get_stats(self) -> dict:
         """
         Get statistics about the trained model
         """
+        self._scoring_state()
         return {
             'is_trained': self.is_trained,
-            'num_categories': len(self.category_vectors),
-            'total_samples': sum(
-                len(descriptions) 
-                for descriptions in self.category_descriptions.values()
-            ),
-            'min_samples': self.min_samples
+            'mode': self.mode,
+            'num_categories': len(self.category_ids),
+            'total_samples': int(self.category_counts.sum()),
+            'min_samples': self.min_samples,
+            'memory_bytes': self.nbytes,
+            'pending_corrections': self.corrections_since_compaction,
+            'indexed_documents': len(self.knn_labels) + len(self.knn_tail_labels)
         }
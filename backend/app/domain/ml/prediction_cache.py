@@ -0,0 +1,94 @@
+"""
+Bounded LRU/TTL cache of category predictions
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# (category_id, confidence, rule_id, model_version); category_id is None when
+# nothing matched, model_version ("scope/vN") is set when a model matched
+CachedPrediction = Tuple[Optional[int], float, Optional[int], Optional[str]]
+
+
+class PredictionCache:
+    """
+    Maps (scope, model_version, normalized_description) to a prediction
+    
+    A new model version changes the key, so stale entries are never read
+    and simply age out of the LRU. Corrections invalidate their pattern
+    explicitly; the TTL bounds how long anything else (corrections made by
+    other processes, fuzzy rule neighbours) can stay stale.
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Tuple[str, int, str], Tuple[float, CachedPrediction]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, key: Tuple[str, int, str]) -> Optional[CachedPrediction]:
+        """
+        Return a cached prediction, None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, prediction = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+    
+    def put(self, key: Tuple[str, int, str], prediction: CachedPrediction):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, prediction)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate_pattern(self, normalized: str):
+        """
+        Drop every entry for a normalized description, across scopes and versions
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[2] == normalized]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> dict:
+        """
+        Get size and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
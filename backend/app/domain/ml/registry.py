@@ -0,0 +1,156 @@
+"""
+Process-wide cache of loaded categorizer models
+"""
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.domain.ml import artifact
+from app.domain.ml.categorizer import MLCategorizer
+
+GLOBAL_SCOPE = 'global'
+
+
+def user_scope(user_id: Optional[int]) -> str:
+    """
+    Scope of a user's own model, the global scope when there is no user
+    """
+    return f'user:{user_id}' if user_id is not None else GLOBAL_SCOPE
+
+
+class ModelRegistry:
+    """
+    Loads categorizer models once per scope and shares them across requests and threads
+    
+    The global model lives in the root directory and each user's model in
+    users/<id>/ below it. User models are loaded lazily and evicted least
+    recently used first once more than max_models are cached or their
+    arrays exceed max_bytes; the global model is never evicted.
+    
+    A cached model is reused until another process changes it on disk. A
+    new active version is loaded from scratch (its arrays are memory-mapped,
+    so this is cheap); lines appended to the current version's correction
+    log are applied to the cached model in place.
+    """
+    
+    def __init__(
+        self,
+        factory: Callable[[str, Path], MLCategorizer],
+        root: Path,
+        max_models: int = 100,
+        max_bytes: int = 256 * 2 ** 20
+    ):
+        self._factory = factory
+        self.root = root
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._models: 'OrderedDict[str, MLCategorizer]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.reloads = 0
+        self.refreshes = 0
+        self.evictions = 0
+        self.load_time_seconds = 0.0
+    
+    def path_for(self, scope: str) -> Path:
+        """
+        Directory holding a scope's model versions
+        """
+        if scope == GLOBAL_SCOPE:
+            return self.root
+        return self.root / 'users' / scope.split(':', 1)[1]
+    
+    def get(self, scope: str = GLOBAL_SCOPE) -> MLCategorizer:
+        """
+        Return the shared model for a scope, loading or reloading it if needed
+        """
+        model = self._models.get(scope)
+        if model is not None and model.disk_signature() == model.loaded_signature:
+            with self._lock:
+                self.hits += 1
+                if scope in self._models:
+                    self._models.move_to_end(scope)
+            return model
+        
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            model = self._models.get(scope)
+            if model is not None:
+                self._models.move_to_end(scope)
+                signature = model.disk_signature()
+                if signature == model.loaded_signature:
+                    self.hits += 1
+                    return model
+                if signature[0] == model.model_version:
+                    model.refresh_corrections()
+                    self.refreshes += 1
+                    return model
+            
+            started = time.perf_counter()
+            fresh = self._factory(scope, self.path_for(scope))
+            fresh.load_model()
+            self.load_time_seconds += time.perf_counter() - started
+            
+            if model is None:
+                self.loads += 1
+            else:
+                self.reloads += 1
+            self._models[scope] = fresh
+            self._models.move_to_end(scope)
+            self._evict(keep=scope)
+            return fresh
+    
+    def get_saved(self, scope: str) -> Optional[MLCategorizer]:
+        """
+        Like get, but None for a scope that never saved a model
+        
+        Lets callers fall back to the global model without caching an
+        empty model for every cold user.
+        """
+        if scope not in self._models and not artifact.read_current(self.path_for(scope)):
+            return None
+        return self.get(scope)
+    
+    def clear(self):
+        """
+        Drop all cached models, forcing a load on next access
+        """
+        with self._lock:
+            self._models.clear()
+    
+    def get_stats(self) -> dict:
+        """
+        Get cache counters
+        """
+        with self._lock:
+            return {
+                'cached': len(self._models),
+                'cached_bytes': self._cached_bytes(),
+                'max_models': self.max_models,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'loads': self.loads,
+                'reloads': self.reloads,
+                'refreshes': self.refreshes,
+                'evictions': self.evictions,
+                'load_time_seconds': round(self.load_time_seconds, 6)
+            }
+    
+    def _cached_bytes(self) -> int:
+        return sum(model.nbytes for model in self._models.values())
+    
+    def _evict(self, keep: str):
+        """
+        Drop least recently used user models until the cache fits its bounds
+        """
+        total_bytes = self._cached_bytes()
+        for scope in list(self._models):
+            if len(self._models) <= self.max_models and total_bytes <= self.max_bytes:
+                break
+            if scope in (GLOBAL_SCOPE, keep):
+                continue
+            total_bytes -= self._models.pop(scope).nbytes
+            self.evictions += 1
@@ -0,0 +1,197 @@
+"""
+In-memory q-gram index for fuzzy matching of categorization rule patterns
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+GRAM_SIZE = 2
+_PAD = '\x00' * (GRAM_SIZE - 1)
+
+# (rule_id, category_id, similarity)
+RuleMatch = Tuple[int, int, float]
+
+
+def grams(text: str) -> Counter:
+    """
+    Padded character q-grams of a string, with multiplicity
+    """
+    padded = f'{_PAD}{text}{_PAD}'
+    return Counter(padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1))
+
+
+def bounded_indel_distance(a: str, b: str, limit: int) -> int:
+    """
+    Insertions plus deletions turning a into b, or limit + 1 once it is known to exceed limit
+    
+    Equals len(a) + len(b) - 2 * LCS(a, b); computed with a row-by-row LCS
+    that gives up as soon as the remaining characters cannot bring the
+    distance back under the limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    total = len(a) + len(b)
+    previous = [0] * (len(a) + 1)
+    for j, char_b in enumerate(b, 1):
+        current = [0]
+        for i, char_a in enumerate(a, 1):
+            if char_a == char_b:
+                current.append(previous[i - 1] + 1)
+            else:
+                current.append(max(previous[i], current[i - 1]))
+        # Each remaining character of b adds at most one to the LCS
+        if total - 2 * min(current[-1] + len(b) - j, len(a)) > limit:
+            return limit + 1
+        previous = current
+    return total - 2 * previous[-1]
+
+
+class RuleIndex:
+    """
+    Bigram inverted index over normalized rule patterns
+    
+    Similarity is 2 * LCS / (len(a) + len(b)), the ratio SequenceMatcher
+    approximates, i.e. 1 - d / (len(a) + len(b)) for the insert/delete
+    distance d. A threshold therefore caps d, and with it the length
+    difference and the number of padded q-grams the edits can destroy:
+    each deleted character breaks at most GRAM_SIZE, each insertion point
+    at most GRAM_SIZE - 1. Only patterns sharing enough grams are compared,
+    with a distance computation that stops once it passes the cap.
+    
+    Bigrams rather than trigrams: with trigrams the bound only prunes
+    above a threshold of 0.8, with bigrams above 2/3, which covers the
+    default SIMILARITY_THRESHOLD of 0.7.
+    """
+    
+    def __init__(self):
+        self._patterns: Dict[int, Tuple[str, int]] = {}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._by_length: Dict[int, Set[int]] = defaultdict(set)
+        self._lock = threading.RLock()
+        self.signature: Optional[tuple] = None
+        self.checked_at = 0.0
+    
+    def __len__(self) -> int:
+        return len(self._patterns)
+    
+    def load(self, rules: Iterable[Tuple[int, str, int]], signature: Optional[tuple] = None):
+        """
+        Replace the index with (rule_id, pattern, category_id) rows
+        """
+        with self._lock:
+            self._patterns = {}
+            self._postings = defaultdict(dict)
+            self._by_length = defaultdict(set)
+            for rule_id, pattern, category_id in rules:
+                self._add(rule_id, pattern, category_id)
+            self.signature = signature
+            self.checked_at = time.monotonic()
+    
+    def upsert(self, rule_id: int, pattern: str, category_id: int):
+        """
+        Add a rule or update its pattern and category
+        """
+        with self._lock:
+            self._remove(rule_id)
+            self._add(rule_id, pattern, category_id)
+    
+    def remove(self, rule_id: int):
+        with self._lock:
+            self._remove(rule_id)
+    
+    def is_stale(self, max_age_seconds: float) -> bool:
+        """
+        Whether the index was last loaded or checked against the database too long ago
+        """
+        return self.signature is None or time.monotonic() - self.checked_at > max_age_seconds
+    
+    def mark_checked(self):
+        self.checked_at = time.monotonic()
+    
+    def invalidate(self):
+        """
+        Force a reload from the database on next use
+        """
+        self.signature = None
+    
+    def match(self, normalized: str, threshold: float) -> Optional[RuleMatch]:
+        """
+        Best rule with similarity >= threshold, ties going to the lowest rule id
+        """
+        if not normalized:
+            return None
+        with self._lock:
+            candidates = self._candidates(normalized, threshold)
+            best: Optional[RuleMatch] = None
+            for rule_id in sorted(candidates):
+                pattern, category_id = self._patterns[rule_id]
+                total = len(normalized) + len(pattern)
+                limit = self._max_distance(total, threshold)
+                distance = bounded_indel_distance(normalized, pattern, limit)
+                if distance > limit:
+                    continue
+                score = 1.0 - distance / total
+                if best is None or score > best[2]:
+                    best = (rule_id, category_id, score)
+            return best
+    
+    def _candidates(self, normalized: str, threshold: float) -> List[int]:
+        query_length = len(normalized)
+        shared: Counter = Counter()
+        for gram, count in grams(normalized).items():
+            for rule_id, rule_count in self._postings.get(gram, {}).items():
+                shared[rule_id] += min(count, rule_count)
+        
+        candidates = []
+        for rule_id, count in shared.items():
+            pattern_length = len(self._patterns[rule_id][0])
+            if count >= self._min_shared(query_length, pattern_length, threshold):
+                candidates.append(rule_id)
+        
+        # At low thresholds long patterns may qualify without sharing any gram
+        for length, rule_ids in self._by_length.items():
+            if self._min_shared(query_length, length, threshold) <= 0:
+                candidates.extend(rule_id for rule_id in rule_ids if rule_id not in shared)
+        return candidates
+    
+    @staticmethod
+    def _max_distance(total_length: int, threshold: float) -> int:
+        return int((1.0 - threshold) * total_length + 1e-9)
+    
+    def _min_shared(self, query_length: int, pattern_length: int, threshold: float) -> float:
+        difference = pattern_length - query_length
+        limit = self._max_distance(query_length + pattern_length, threshold)
+        if abs(difference) > limit:
+            return float('inf')
+        # The distance has the parity of the length difference
+        limit -= (limit - difference) % 2
+        deletions = (limit - difference) // 2
+        insertions = (limit + difference) // 2
+        return max(
+            query_length + GRAM_SIZE - 1 - GRAM_SIZE * deletions - (GRAM_SIZE - 1) * insertions,
+            pattern_length + GRAM_SIZE - 1 - GRAM_SIZE * insertions - (GRAM_SIZE - 1) * deletions
+        )
+    
+    def _add(self, rule_id: int, pattern: str, category_id: int):
+        self._patterns[rule_id] = (pattern, category_id)
+        for gram, count in grams(pattern).items():
+            self._postings[gram][rule_id] = count
+        self._by_length[len(pattern)].add(rule_id)
+    
+    def _remove(self, rule_id: int):
+        entry = self._patterns.pop(rule_id, None)
+        if entry is None:
+            return
+        pattern = entry[0]
+        for gram in grams(pattern):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(rule_id, None)
+                if not postings:
+                    del self._postings[gram]
+        self._by_length[len(pattern)].discard(rule_id)
+        if not self._by_length[len(pattern)]:
+            del self._by_length[len(pattern)]
@@ -0,0 +1,36 @@
+"""
+Text normalization shared by the ML and rule-based categorizers
+"""
+import re
+import unicodedata
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# Anything that is not a letter, digit or whitespace in any script
+_NON_WORD = re.compile(r'[^\w\s]|_')
+
+RUSSIAN_STOP_WORDS = frozenset("""
+    а без более бы был была были было быть в вам вас ведь весь во вот все всего
+    всегда всех всю вы где да даже для до другой его ее ей ему если есть еще же
+    за зачем здесь и из или им иногда их к как какая какой когда конечно кто
+    куда ли лучше между меня мне много может можно мой моя мы на над надо
+    наконец нас не него нее ней нельзя нет ни нибудь никогда ним них ничего но
+    ну о об один он она они опять от перед по под после потом потому почти при
+    про раз разве с сам свою себе себя сейчас со совсем так такой там тебя тем
+    теперь то тогда того тоже только том тот три тут ты у уж уже хоть чего чем
+    через что чтоб чтобы чуть эти этого этой этом этот эту я
+""".split())
+
+STOP_WORDS = frozenset(ENGLISH_STOP_WORDS) | RUSSIAN_STOP_WORDS
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase, fold Unicode compatibility forms and strip punctuation
+
+    Works for any script, so Cyrillic descriptions like "Кофе, Ёлка!" become
+    "кофе елка" instead of an empty string.
+    """
+    text = unicodedata.normalize('NFKC', text).lower().replace('ё', 'е')
+    text = _NON_WORD.sub('', text)
+    return ' '.join(text.split())
@@ -0,0 +1,65 @@
+"""
+Optional on-disk store of preprocessed training descriptions
+"""
+import json
+from pathlib import Path
+from typing import Iterator, Tuple
+
+
+class TrainingStore:
+    """
+    Append-only record of (category_id, description) pairs the model learned from
+    
+    The runtime model keeps only per-category sums, so this store is the
+    place to keep raw text for inspection or offline experiments. It is
+    never read on the prediction path.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+    
+    def rewrite(self) -> 'TrainingStoreWriter':
+        """
+        Start replacing the store with a full training set
+        """
+        return TrainingStoreWriter(self.path)
+    
+    def append(self, category_id: int, description: str):
+        """
+        Record one more labeled description
+        """
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'category_id': category_id, 'description': description}) + '\n')
+    
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                yield record['category_id'], record['description']
+
+
+class TrainingStoreWriter:
+    """
+    Streams records to a temp file that replaces the store on commit
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_suffix(path.suffix + '.tmp')
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+    
+    def write(self, category_id: int, description: str):
+        self._file.write(json.dumps({'category_id': category_id, 'description': description}) + '\n')
+    
+    def commit(self):
+        self._file.close()
+        self.tmp_path.replace(self.path)
+    
+    def abort(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from decimal import Decimal
 
+from app.domain.services.statistics_cache import bump_data_version
 from app.models.account import Account
 from app.schemas.account import AccountCreate, AccountUpdate
 
@@ -29,6 +30,7 @@ class AccountService:
             balance=account_data.balance
         )
         self.db.add(account)
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         self.db.refresh(account)
         return account
@@ -43,6 +45,7 @@ class AccountService:
         for key, value in update_data.items():
             setattr(account, key, value)
         
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         self.db.refresh(account)
         return account
@@ -54,6 +57,7 @@ class AccountService:
             return False
         
         self.db.delete(account)
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         return True
     
@@ -0,0 +1,289 @@
+"""
+Background categorization of newly created transactions
+"""
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, String, bindparam, cast, column, update, values
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.domain.services.categorization_service import SOURCE_OTHER, CategorizationService
+from app.domain.services.daily_aggregates import AggregateDeltas
+from app.domain.services.statistics_cache import bump_data_version
+from app.models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# (transaction_id, category_id to set or None, predicted_category_id, confidence, source, model_version)
+Prediction = Tuple[int, Optional[int], Optional[int], float, str, Optional[str]]
+
+
+def categorize_transactions(db: Session, transaction_ids: List[int]) -> int:
+    """
+    Predict categories for uncategorized transactions and write them back, returning how many were set
+    """
+    rows = db.query(Transaction.id, Transaction.user_id, Transaction.description).filter(
+        Transaction.id.in_(transaction_ids),
+        Transaction.category_id.is_(None)
+    ).all()
+    updated = categorize_rows(db, rows)
+    db.commit()
+    return updated
+
+
+def categorize_rows(
+    db: Session,
+    rows: List[Tuple[int, Optional[int], str]],
+    min_confidence: float = 0.0
+) -> int:
+    """
+    Predict categories for (transaction_id, user_id, description) rows and write them back without committing
+    
+    Rows are predicted in one batch per owner, with the owner's model.
+    Predictions below min_confidence and rows that only matched the
+    "Other" fallback stay uncategorized but still get their provenance,
+    and rows categorized by a user in the meantime are not touched.
+    Returns how many categories were set.
+    """
+    by_user: Dict[Optional[int], List[Tuple[int, str]]] = defaultdict(list)
+    for transaction_id, user_id, description in rows:
+        by_user[user_id].append((transaction_id, description))
+    
+    predictions: List[Prediction] = []
+    for user_id, transactions in by_user.items():
+        service = CategorizationService(db, user_id)
+        results = service.predict_categories_detailed([description for _, description in transactions])
+        for (transaction_id, _), prediction in zip(transactions, results):
+            applied = (
+                prediction.category_id is not None
+                and prediction.source != SOURCE_OTHER
+                and prediction.confidence >= min_confidence
+            )
+            predictions.append((
+                transaction_id,
+                prediction.category_id if applied else None,
+                prediction.category_id,
+                prediction.confidence,
+                prediction.source,
+                prediction.model_version
+            ))
+    
+    if not predictions:
+        return 0
+    return _apply_predictions(db, predictions)
+
+
+def _apply_predictions(db: Session, predictions: List[Prediction]) -> int:
+    """
+    Write categories and prediction provenance in one UPDATE, returning how many categories were set
+    
+    Every prediction is recorded, applied or not, so accuracy can be
+    measured later without running the model again. Rows that got a
+    category are moved out of the uncategorized daily aggregates.
+    """
+    transactions = Transaction.__table__
+    updated_columns = (
+        transactions.c.user_id,
+        transactions.c.transaction_date,
+        transactions.c.transaction_type,
+        transactions.c.category_id,
+        transactions.c.amount
+    )
+    if db.get_bind().dialect.name == 'postgresql':
+        statement = _values_update(predictions).returning(*updated_columns)
+        return _move_categorized(db, db.execute(statement).all())
+    
+    # SQLite (used by the scripts) has no VALUES alias with column names
+    statement = (
+        update(transactions)
+        .where(
+            transactions.c.id == bindparam('transaction_id'),
+            transactions.c.category_id.is_(None)
+        )
+        .values(
+            category_id=bindparam('applied_category_id'),
+            predicted_category_id=bindparam('predicted'),
+            prediction_confidence=bindparam('confidence'),
+            prediction_source=bindparam('source'),
+            model_version=bindparam('version')
+        )
+        .returning(*updated_columns)
+    )
+    updated = []
+    for transaction_id, category_id, predicted_category_id, confidence, source, model_version in predictions:
+        result = db.execute(statement, {
+            'transaction_id': transaction_id,
+            'applied_category_id': category_id,
+            'predicted': predicted_category_id,
+            'confidence': confidence,
+            'source': source,
+            'version': model_version
+        })
+        updated.extend(result.all())
+    return _move_categorized(db, updated)
+
+
+def _values_update(predictions: List[Prediction]):
+    """
+    UPDATE of transactions from a VALUES list of predictions, for PostgreSQL
+    
+    PostgreSQL types a VALUES column by its contents, so a column that is
+    NULL in every row (a batch of misses) becomes text. Nullable id
+    columns are cast back to integer.
+    """
+    transactions = Transaction.__table__
+    predicted = values(
+        column('transaction_id', Integer),
+        column('category_id', Integer),
+        column('predicted_category_id', Integer),
+        column('confidence', Float),
+        column('source', String),
+        column('model_version', String),
+        name='predicted'
+    ).data(predictions)
+    return (
+        update(transactions)
+        .where(
+            transactions.c.id == predicted.c.transaction_id,
+            transactions.c.category_id.is_(None)
+        )
+        .values(
+            category_id=cast(predicted.c.category_id, Integer),
+            predicted_category_id=cast(predicted.c.predicted_category_id, Integer),
+            prediction_confidence=predicted.c.confidence,
+            prediction_source=predicted.c.source,
+            model_version=predicted.c.model_version
+        )
+    )
+
+
+def _move_categorized(db: Session, rows: list) -> int:
+    """
+    Move updated (user_id, transaction_date, transaction_type, category_id, amount) rows out of "uncategorized"
+    
+    Their owners' cached statistics are invalidated. Returns how many rows got a category.
+    """
+    deltas = AggregateDeltas()
+    user_ids = []
+    for user_id, transaction_date, transaction_type, category_id, amount in rows:
+        if category_id is None:
+            continue
+        deltas.add(user_id, transaction_date, transaction_type, None, -amount, -1)
+        deltas.add(user_id, transaction_date, transaction_type, category_id, amount)
+        user_ids.append(user_id)
+    deltas.apply(db)
+    bump_data_version(db, user_ids)
+    return len(user_ids)
+
+
+class AutoCategorizationQueue:
+    """
+    Queue of transaction ids categorized on a worker thread after their insert commits
+    
+    The worker collects up to batch_size ids, waiting at most
+    max_wait_seconds after the first one, so a burst of creates becomes
+    one prediction batch and one UPDATE while a single create is picked
+    up almost immediately. Enqueueing never touches the database.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = 100,
+        max_wait_seconds: float = 0.2
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.categorized = 0
+        self.failed = 0
+    
+    def enqueue(self, transaction_ids: Iterable[int]):
+        """
+        Schedule transactions for categorization; call after their insert is committed
+        """
+        self._ensure_worker()
+        for transaction_id in transaction_ids:
+            self._queue.put(transaction_id)
+    
+    def shutdown(self, timeout: float = 10.0):
+        """
+        Categorize whatever is queued and stop the worker
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+    
+    def get_stats(self) -> dict:
+        """
+        Get queue length and counters
+        """
+        return {
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'categorized': self.categorized,
+            'failed': self.failed
+        }
+    
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='auto-categorization',
+                    daemon=True
+                )
+                self._thread.start()
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._process(batch)
+    
+    def _process(self, transaction_ids: List[int]):
+        db = self._session_factory()
+        try:
+            self.categorized += categorize_transactions(db, transaction_ids)
+            self.batches += 1
+        except Exception:
+            db.rollback()
+            self.failed += len(transaction_ids)
+            logger.exception("Failed to categorize %s transactions", len(transaction_ids))
+        finally:
+            db.close()
+
+
+# Shared by every service instance in this process
+auto_categorization = AutoCategorizationQueue(
+    batch_size=settings.AUTO_CATEGORIZATION_BATCH_SIZE,
+    max_wait_seconds=settings.AUTO_CATEGORIZATION_MAX_WAIT_SECONDS
+)
@@ -0,0 +1,257 @@
+"""
+Resumable back-categorization of uncategorized transaction history
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.domain.services.auto_categorization import categorize_rows
+from app.domain.services.training_jobs import JOBS_DIR
+from app.models.transaction import Transaction, TransactionType
+
+logger = logging.getLogger(__name__)
+
+
+class BackCategorizationConflictError(RuntimeError):
+    """Raised when a user's history is already being back-categorized"""
+    
+    def __init__(self, user_id: int):
+        super().__init__(f"Back-categorization for user {user_id} is already running")
+        self.user_id = user_id
+
+
+def checkpoint_path(user_id: int, jobs_dir: Path = JOBS_DIR) -> Path:
+    return jobs_dir / f"back-categorization-{user_id}.json"
+
+
+def read_checkpoint(user_id: int, jobs_dir: Path = JOBS_DIR) -> Optional[dict]:
+    """
+    Last saved state of a user's job, None if it never ran
+    """
+    try:
+        with open(checkpoint_path(user_id, jobs_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class BackCategorizationJob:
+    """
+    Walks a user's uncategorized expenses by id and categorizes them chunk by chunk
+    
+    Each chunk is predicted in one batch and written with one UPDATE, and
+    only predictions with at least min_confidence are applied. Rows left
+    uncategorized stay behind the keyset, so every chunk makes progress.
+    The last id is checkpointed after each committed chunk; a stopped or
+    crashed job resumes from there, and repeating a chunk is harmless
+    because only rows that are still uncategorized are updated.
+    """
+    
+    def __init__(
+        self,
+        db: Session,
+        user_id: int,
+        min_confidence: float,
+        chunk_size: int = 1000,
+        jobs_dir: Path = JOBS_DIR
+    ):
+        self.db = db
+        self.user_id = user_id
+        self.min_confidence = min_confidence
+        self.chunk_size = chunk_size
+        self.path = checkpoint_path(user_id, jobs_dir)
+    
+    def prepare(self, restart: bool = False) -> dict:
+        """
+        Load the checkpoint (or start over) and save the state of a new run
+        """
+        state = None if restart else read_checkpoint(self.user_id, self.path.parent)
+        if state is None or state["status"] == "completed":
+            state = {
+                "user_id": self.user_id,
+                "last_id": 0,
+                "rows_processed": 0,
+                "rows_categorized": 0,
+                "elapsed_seconds": 0.0,
+                "created_at": datetime.utcnow().isoformat()
+            }
+        state.update({
+            "status": "running",
+            "min_confidence": self.min_confidence,
+            "error": None,
+            "finished_at": None
+        })
+        state["total_rows"] = state["rows_processed"] + self._remaining(state["last_id"])
+        self._save(state)
+        return state
+    
+    def run(
+        self,
+        state: Optional[dict] = None,
+        should_stop: Callable[[], bool] = lambda: False,
+        progress: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        """
+        Categorize until the history is exhausted or should_stop() returns True, returning the final state
+        
+        Continues from state as returned by prepare(), or from the checkpoint.
+        """
+        if state is None:
+            state = self.prepare()
+        
+        try:
+            while not should_stop():
+                started = time.perf_counter()
+                rows = self.db.execute(
+                    select(Transaction.id, Transaction.user_id, Transaction.description)
+                    .where(self._uncategorized(), Transaction.id > state["last_id"])
+                    .order_by(Transaction.id)
+                    .limit(self.chunk_size)
+                ).all()
+                if not rows:
+                    state["status"] = "completed"
+                    break
+                
+                categorized = categorize_rows(self.db, rows, self.min_confidence)
+                self.db.commit()
+                
+                state["last_id"] = rows[-1][0]
+                state["rows_processed"] += len(rows)
+                state["rows_categorized"] += categorized
+                state["elapsed_seconds"] += time.perf_counter() - started
+                self._save(state, progress)
+            else:
+                state["status"] = "stopped"
+        except Exception as exc:
+            self.db.rollback()
+            state["status"] = "failed"
+            state["error"] = str(exc) or exc.__class__.__name__
+            logger.exception("Back-categorization for user %s failed", self.user_id)
+        
+        state["finished_at"] = datetime.utcnow().isoformat()
+        self._save(state, progress)
+        return state
+    
+    def _uncategorized(self):
+        return (
+            (Transaction.user_id == self.user_id)
+            & Transaction.category_id.is_(None)
+            & (Transaction.transaction_type == TransactionType.EXPENSE)
+        )
+    
+    def _remaining(self, last_id: int) -> int:
+        return self.db.query(func.count(Transaction.id)).filter(
+            self._uncategorized(),
+            Transaction.id > last_id
+        ).scalar()
+    
+    def _save(self, state: dict, progress: Optional[Callable[[dict], None]] = None):
+        elapsed = state["elapsed_seconds"]
+        state["rows_per_second"] = round(state["rows_processed"] / elapsed, 1) if elapsed else None
+        state["updated_at"] = datetime.utcnow().isoformat()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+        if progress:
+            progress(state)
+
+
+class BackCategorizationManager:
+    """
+    Runs back-categorization jobs on background threads, at most one per user
+    
+    Prediction reuses the models already loaded in this process, so jobs
+    run on threads rather than worker processes. State is read from the
+    checkpoint files, so jobs started from the CLI show up as well.
+    """
+    
+    def __init__(self, jobs_dir: Path = JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self._threads: Dict[int, threading.Thread] = {}
+        self._stop_events: Dict[int, threading.Event] = {}
+        self._lock = threading.Lock()
+    
+    def start(self, user_id: int, min_confidence: float, restart: bool = False) -> dict:
+        """
+        Start or resume a user's job, returning its initial state
+        
+        Raises BackCategorizationConflictError if one is already running.
+        """
+        with self._lock:
+            thread = self._threads.get(user_id)
+            if thread is not None and thread.is_alive():
+                raise BackCategorizationConflictError(user_id)
+            
+            db = SessionLocal()
+            try:
+                job = BackCategorizationJob(
+                    db,
+                    user_id,
+                    min_confidence,
+                    chunk_size=settings.BACK_CATEGORIZATION_CHUNK_SIZE,
+                    jobs_dir=self.jobs_dir
+                )
+                state = job.prepare(restart)
+            except Exception:
+                db.close()
+                raise
+            
+            stop_event = threading.Event()
+            thread = threading.Thread(
+                target=self._run,
+                args=(job, state, stop_event),
+                name=f"back-categorization-{user_id}",
+                daemon=True
+            )
+            self._threads[user_id] = thread
+            self._stop_events[user_id] = stop_event
+            thread.start()
+        return dict(state)
+    
+    def get(self, user_id: int) -> Optional[dict]:
+        return read_checkpoint(user_id, self.jobs_dir)
+    
+    def stop(self, user_id: int) -> bool:
+        """
+        Ask a running job to stop after its current chunk
+        """
+        with self._lock:
+            thread = self._threads.get(user_id)
+            if thread is None or not thread.is_alive():
+                return False
+            self._stop_events[user_id].set()
+            return True
+    
+    def shutdown(self, timeout: float = 10.0):
+        """
+        Stop all jobs; they resume from their checkpoint when started again
+        """
+        with self._lock:
+            threads = list(self._threads.values())
+            for stop_event in self._stop_events.values():
+                stop_event.set()
+        for thread in threads:
+            thread.join(timeout)
+    
+    def _run(self, job: BackCategorizationJob, state: dict, stop_event: threading.Event):
+        try:
+            job.run(state, should_stop=stop_event.is_set)
+        finally:
+            job.db.close()
+
+
+# Shared by the API process
+back_categorization = BackCategorizationManager()
@@ -1,72 +1,229 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Optional, List
-import re
-from difflib import SequenceMatcher
+from sqlalchemy import Float, case, cast, func, select
+from typing import Callable, Dict, NamedTuple, Optional, List, Tuple
+from pathlib import Path
 
 from app.models.categorization_rule import CategorizationRule
 from app.models.category import Category
 from app.models.transaction import Transaction
 from app.models.user_correction import UserCorrection
 from app.core.config import settings
+from app.core.database import dialect_insert
 from app.domain.ml.categorizer import MLCategorizer
+from app.domain.ml.prediction_cache import CachedPrediction, PredictionCache
+from app.domain.ml.rule_index import RuleIndex
+from app.domain.ml.registry import GLOBAL_SCOPE, ModelRegistry, user_scope
+from app.domain.ml.text import normalize
+from app.domain.services.rule_usage import rule_usage
+
+
+MODEL_ROOT = Path("app/domain/ml/models")
+
+SOURCE_ML = "ml"
+SOURCE_RULE = "rule"
+SOURCE_OTHER = "other"
+
+
+# (transaction_id, old_category_id, new_category_id, description)
+Correction = Tuple[int, Optional[int], int, str]
+
+
+class CategoryPrediction(NamedTuple):
+    category_id: Optional[int]
+    confidence: float
+    # SOURCE_ML, SOURCE_RULE or SOURCE_OTHER
+    source: str
+    rule_id: Optional[int] = None
+    # "scope/vN" of the model that matched, for SOURCE_ML
+    model_version: Optional[str] = None
+
+
+def _model_label(scope: str, model: MLCategorizer) -> str:
+    return f"{scope}/v{model.model_version}"
+
+
+def _create_categorizer(scope: str, model_path: Path) -> MLCategorizer:
+    # Users label far fewer descriptions than the whole app, so their
+    # models get a smaller hashed feature space
+    n_features = (
+        settings.CATEGORIZER_HASH_FEATURES
+        if scope == GLOBAL_SCOPE
+        else settings.CATEGORIZER_USER_HASH_FEATURES
+    )
+    return MLCategorizer(
+        min_samples=settings.MIN_TRAINING_SAMPLES,
+        n_features=n_features,
+        compact_every=settings.CATEGORIZER_COMPACT_EVERY,
+        keep_training_text=settings.CATEGORIZER_KEEP_TRAINING_TEXT,
+        model_path=model_path,
+        char_ngrams=settings.CATEGORIZER_CHAR_NGRAMS,
+        mode=settings.CATEGORIZER_MODE,
+        knn_k=settings.KNN_K
+    )
+
+
+# Shared by every service instance in this process
+model_registry = ModelRegistry(
+    _create_categorizer,
+    MODEL_ROOT,
+    max_models=settings.CATEGORIZER_MAX_CACHED_MODELS,
+    max_bytes=settings.CATEGORIZER_MAX_CACHED_BYTES
+)
+rule_index = RuleIndex()
+prediction_cache = PredictionCache(
+    max_size=settings.PREDICTION_CACHE_SIZE,
+    ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS
+)
 
 
 class CategorizationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, user_id: Optional[int] = None):
         self.db = db
-        self.ml_categorizer = MLCategorizer(min_samples=settings.MIN_TRAINING_SAMPLES)
-        # Try to load existing model
-        self.ml_categorizer.load_model()
+        self.user_id = user_id
+        self.scope = user_scope(user_id)
+        self.ml_categorizer, self.model_scope = self._prediction_model()
+        self.fallback_categorizer = self._fallback_model()
+    
+    def _prediction_model(self) -> Tuple[MLCategorizer, str]:
+        """The user's own model once trained, the global model otherwise"""
+        if self.user_id is not None:
+            user_model = model_registry.get_saved(self.scope)
+            if user_model is not None and user_model.is_trained:
+                return user_model, self.scope
+        return model_registry.get(), GLOBAL_SCOPE
+    
+    def _fallback_model(self) -> Optional[MLCategorizer]:
+        """
+        The global model, when a user model is used
+        
+        A user model only knows the few categories its owner has corrected,
+        so descriptions it cannot score are tried against the global model
+        before the rules.
+        """
+        return model_registry.get() if self.model_scope != GLOBAL_SCOPE else None
+    
+    def _cache_scope(self) -> str:
+        """Scope part of the prediction cache key, covering every model that can answer"""
+        if self.fallback_categorizer is None:
+            return self.model_scope
+        return f"{self.model_scope}+{_model_label(GLOBAL_SCOPE, self.fallback_categorizer)}"
     
-    def predict_category(self, description: str) -> Optional[int]:
+    def predict_category(self, description: str, record_usage: bool = True) -> Optional[int]:
         """Predict category for a transaction description"""
-        # First try ML-based prediction
-        ml_prediction = self._predict_with_ml(description)
-        if ml_prediction:
-            return ml_prediction
+        return self.predict_categories([description], record_usage)[0]
+    
+    def predict_categories(self, descriptions: List[str], record_usage: bool = True) -> List[Optional[int]]:
+        """Predict categories for many descriptions, falling back to rules per miss"""
+        return [
+            prediction.category_id
+            for prediction in self.predict_categories_detailed(descriptions, record_usage)
+        ]
+    
+    def predict_categories_detailed(
+        self,
+        descriptions: List[str],
+        record_usage: bool = True
+    ) -> List[CategoryPrediction]:
+        """
+        Predict categories along with confidence and the path that produced each one
         
-        # Fallback to rule-based prediction
-        rule_prediction = self._predict_with_rules(description)
-        if rule_prediction:
-            return rule_prediction
+        Rule hits count towards times_applied unless record_usage is False,
+        e.g. for test predictions that are never applied to a transaction.
+        """
+        if not descriptions:
+            return []
         
-        # Last resort: return "Other" category
-        return self._get_other_category_id()
-    
-    def _predict_with_ml(self, description: str) -> Optional[int]:
-        """Use ML model for prediction"""
-        if not self.ml_categorizer.is_trained:
-            return None
+        # Repeated descriptions (same coffee shop, same taxi) skip scoring entirely
+        cache_scope = self._cache_scope()
+        keys = [
+            (cache_scope, self.ml_categorizer.model_version, self._normalize_text(description))
+            for description in descriptions
+        ]
+        results: List[Optional[CachedPrediction]] = [prediction_cache.get(key) for key in keys]
+        
+        misses = [index for index, result in enumerate(results) if result is None]
+        if misses:
+            fresh = self._predict_uncached([descriptions[index] for index in misses])
+            for index, result in zip(misses, fresh):
+                results[index] = result
+                prediction_cache.put(keys[index], result)
         
-        result = self.ml_categorizer.predict(description, threshold=settings.SIMILARITY_THRESHOLD)
-        if result:
-            category_id, confidence = result
-            return category_id
+        # Counted in memory and flushed in batches, so prediction never writes
+        if record_usage:
+            rule_usage.record(rule_id for _, _, rule_id, _ in results if rule_id is not None)
         
-        return None
+        other_category_id = None
+        if any(category_id is None for category_id, _, _, _ in results):
+            # Last resort: the "Other" category
+            other_category_id = self._get_other_category_id()
+        
+        return [
+            CategoryPrediction(other_category_id, 0.0, SOURCE_OTHER, None)
+            if category_id is None
+            else CategoryPrediction(
+                category_id,
+                confidence,
+                SOURCE_RULE if rule_id is not None else SOURCE_ML,
+                rule_id,
+                model_version
+            )
+            for category_id, confidence, rule_id, model_version in results
+        ]
     
-    def _predict_with_rules(self, description: str) -> Optional[int]:
-        """Use rule-based system for prediction"""
-        normalized = self._normalize_text(description)
-        rules = self.db.query(CategorizationRule).all()
+    def _predict_uncached(self, descriptions: List[str]) -> List[CachedPrediction]:
+        """Score with the ML model first, then the global model and the rules for the misses only"""
+        results: List[CachedPrediction] = [(None, 0.0, None, None)] * len(descriptions)
+        models = [(self.model_scope, self.ml_categorizer)]
+        if self.fallback_categorizer is not None:
+            models.append((GLOBAL_SCOPE, self.fallback_categorizer))
         
-        best_match = None
-        best_similarity = 0.0
+        misses = list(range(len(descriptions)))
+        for scope, model in models:
+            if not misses or not model.is_trained:
+                continue
+            label = _model_label(scope, model)
+            ml_results = model.predict_batch(
+                [descriptions[position] for position in misses],
+                threshold=settings.ML_SIMILARITY_THRESHOLD
+            )
+            for position, result in zip(misses, ml_results):
+                if result:
+                    results[position] = (result[0], result[1], None, label)
+            misses = [position for position in misses if results[position][0] is None]
         
-        for rule in rules:
-            similarity = self._calculate_similarity(normalized, rule.pattern)
-            
-            if similarity > best_similarity and similarity >= settings.SIMILARITY_THRESHOLD:
-                best_similarity = similarity
-                best_match = rule
+        if not misses:
+            return results
         
-        if best_match:
-            best_match.times_applied += 1
-            self.db.commit()
-            return best_match.category_id
+        # Only the rows the ML model missed are matched against rules
+        index = self._rule_index()
+        for position in misses:
+            match = index.match(self._normalize_text(descriptions[position]), settings.SIMILARITY_THRESHOLD)
+            if match:
+                rule_id, category_id, similarity = match
+                results[position] = (category_id, similarity, rule_id, None)
         
-        return None
+        return results
+    
+    def _rule_index(self) -> RuleIndex:
+        """The shared rule index, reloaded when the rules table changed elsewhere"""
+        if rule_index.is_stale(settings.RULE_INDEX_CHECK_SECONDS):
+            signature = tuple(self.db.query(
+                func.count(CategorizationRule.id),
+                func.max(CategorizationRule.id),
+                func.max(CategorizationRule.updated_at)
+            ).filter(CategorizationRule.scope == GLOBAL_SCOPE).one())
+            if signature != rule_index.signature:
+                rule_index.load(
+                    self.db.query(
+                        CategorizationRule.id,
+                        CategorizationRule.pattern,
+                        CategorizationRule.category_id
+                    ).filter(CategorizationRule.scope == GLOBAL_SCOPE).all(),
+                    signature
+                )
+            else:
+                rule_index.mark_checked()
+        return rule_index
     
     def learn_from_correction(
         self, 
@@ -76,66 +233,149 @@ class CategorizationService:
         description: str
     ):
         """Learn from user correction"""
-        # Record the correction
-        correction = UserCorrection(
-            transaction_id=transaction_id,
-            old_category_id=old_category_id,
-            new_category_id=new_category_id
-        )
-        self.db.add(correction)
+        self.learn_from_corrections([(transaction_id, old_category_id, new_category_id, description)])
+    
+    def learn_from_corrections(self, corrections: List[Correction], record: bool = True):
+        """
+        Learn from many (transaction_id, old_category_id, new_category_id, description) corrections
         
-        # Update ML model
-        self.ml_categorizer.update_with_correction(description, new_category_id)
+        Rules are created or updated with a single INSERT ... ON CONFLICT
+        for the whole batch. Corrections of the same pattern are applied in
+        order: the last category wins, and only the corrections to it after
+        the last change of category count towards times_correct.
         
-        # Create or update categorization rule
-        normalized = self._normalize_text(description)
+        Pass record=False when the caller already logged the corrections
+        in user_corrections.
+        """
+        if not corrections:
+            return
         
-        existing_rule = self.db.query(CategorizationRule).filter(
-            CategorizationRule.pattern == normalized
-        ).first()
+        # Record the corrections
+        if record:
+            self.db.add_all([
+                UserCorrection(
+                    transaction_id=transaction_id,
+                    old_category_id=old_category_id,
+                    new_category_id=new_category_id
+                )
+                for transaction_id, old_category_id, new_category_id, _ in corrections
+            ])
         
-        if existing_rule:
-            if existing_rule.category_id == new_category_id:
-                existing_rule.times_correct += 1
-            else:
-                existing_rule.category_id = new_category_id
-                existing_rule.times_correct = 1
-                existing_rule.times_applied = 1
-            
-            existing_rule.confidence = (
-                existing_rule.times_correct / existing_rule.times_applied
-            )
-        else:
-            new_rule = CategorizationRule(
-                pattern=normalized,
-                category_id=new_category_id,
-                confidence=1.0,
-                times_applied=1,
-                times_correct=1
-            )
-            self.db.add(new_rule)
+        # Update the user's own model and the global one it falls back to
+        models = [model_registry.get(self.scope)]
+        if self.scope != GLOBAL_SCOPE:
+            models.append(model_registry.get())
+        for _, _, new_category_id, description in corrections:
+            for model in models:
+                model.update_with_correction(description, new_category_id)
+        
+        # Create or update categorization rules, one row per pattern
+        latest: Dict[str, Tuple[int, int]] = {}
+        for _, _, new_category_id, description in corrections:
+            normalized = self._normalize_text(description)
+            category_id, count = latest.get(normalized, (None, 0))
+            latest[normalized] = (new_category_id, count + 1 if category_id == new_category_id else 1)
         
+        rules = self._upsert_rules(latest)
         self.db.commit()
+        
+        for rule_id, pattern, category_id in rules:
+            rule_index.upsert(rule_id, pattern, category_id)
+            prediction_cache.invalidate_pattern(pattern)
+    
+    def _upsert_rules(self, latest: Dict[str, Tuple[int, int]]) -> List[Tuple[int, str, int]]:
+        """
+        Insert or update the rules for {pattern: (category_id, corrections)} in one statement
+        
+        A rule corrected to the category it already has gains the
+        corrections in times_correct; one moved to another category starts
+        over. Confidence is times_correct / times_applied, capped at 1.0 as
+        corrections can outnumber applications. Returns (id, pattern,
+        category_id) of every affected rule.
+        """
+        table = CategorizationRule.__table__
+        insert = dialect_insert(self.db)(table).values([
+            {
+                # Rules back every scope, like the global model
+                "scope": GLOBAL_SCOPE,
+                "pattern": pattern,
+                "category_id": category_id,
+                "confidence": 1.0,
+                "times_applied": 1,
+                "times_correct": count
+            }
+            for pattern, (category_id, count) in latest.items()
+        ])
+        same_category = table.c.category_id == insert.excluded.category_id
+        ratio = cast(table.c.times_correct + insert.excluded.times_correct, Float) / table.c.times_applied
+        statement = insert.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.pattern],
+            set_={
+                "category_id": insert.excluded.category_id,
+                "times_correct": case(
+                    (same_category, table.c.times_correct + insert.excluded.times_correct),
+                    else_=insert.excluded.times_correct
+                ),
+                "times_applied": case(
+                    (same_category, table.c.times_applied),
+                    else_=insert.excluded.times_applied
+                ),
+                "confidence": case(
+                    (~same_category, insert.excluded.confidence),
+                    (ratio < 1.0, ratio),
+                    else_=1.0
+                ),
+                "updated_at": func.now()
+            }
+        ).returning(table.c.id, table.c.pattern, table.c.category_id)
+        return [tuple(row) for row in self.db.execute(statement)]
     
-    def train_ml_model(self) -> dict:
+    def train_ml_model(self, progress: Optional[Callable[[int, int], None]] = None) -> dict:
         """
         Train the ML model on all existing categorized transactions
+        
+        A service bound to a user trains that user's own model on their
+        transactions only.
+        
+        progress, if given, is called with (rows_processed, total_rows)
+        after every chunk.
         """
-        transactions = self.db.query(Transaction).filter(
-            Transaction.category_id.isnot(None)
-        ).all()
+        filters = [Transaction.category_id.isnot(None)]
+        if self.user_id is not None:
+            filters.append(Transaction.user_id == self.user_id)
         
-        if len(transactions) < settings.MIN_TRAINING_SAMPLES:
+        current_count = self.db.query(func.count(Transaction.id)).filter(*filters).scalar()
+        
+        if current_count < settings.MIN_TRAINING_SAMPLES:
             return {
                 "success": False,
                 "message": f"Not enough training data. Need at least {settings.MIN_TRAINING_SAMPLES} transactions.",
-                "current_count": len(transactions)
+                "current_count": current_count
             }
         
-        success = self.ml_categorizer.train(transactions)
+        # Only the two columns training needs, fetched through a server-side
+        # cursor so rows never pile up in memory
+        result = self.db.execute(
+            select(Transaction.description, Transaction.category_id)
+            .where(*filters)
+            .execution_options(yield_per=settings.CATEGORIZER_TRAINING_CHUNK_SIZE)
+        )
+        
+        def chunks():
+            rows_processed = 0
+            for partition in result.partitions():
+                yield partition
+                rows_processed += len(partition)
+                if progress:
+                    progress(rows_processed, current_count)
+        
+        model = model_registry.get(self.scope)
+        success = model.train_stream(chunks())
         
         if success:
-            stats = self.ml_categorizer.get_stats()
+            self.ml_categorizer, self.model_scope = model, self.scope
+            self.fallback_categorizer = self._fallback_model()
+            stats = model.get_stats()
             return {
                 "success": True,
                 "message": "ML model trained successfully",
@@ -145,7 +385,7 @@ class CategorizationService:
             return {
                 "success": False,
                 "message": "Training failed. Not enough diverse data.",
-                "stats": self.ml_categorizer.get_stats()
+                "stats": model.get_stats()
             }
     
     def get_categorization_stats(self) -> dict:
@@ -165,20 +405,60 @@ class CategorizationService:
                 "average_confidence": float(avg_confidence)
             },
             "machine_learning": ml_stats,
+            "model_scope": self.model_scope,
+            "prediction_cache": prediction_cache.get_stats(),
+            "model_cache": model_registry.get_stats(),
+            "rule_usage": rule_usage.get_stats(),
             "user_corrections": total_corrections,
-            "threshold": settings.SIMILARITY_THRESHOLD
+            "threshold": settings.SIMILARITY_THRESHOLD,
+            "ml_threshold": settings.ML_SIMILARITY_THRESHOLD
         }
     
+    def get_prediction_precision(self) -> List[dict]:
+        """
+        Precision of recorded predictions per source and model version, computed in SQL
+        
+        A prediction counts once its transaction has a category; it is wrong
+        if a user moved the transaction to another category afterwards.
+        """
+        corrected = select(UserCorrection.transaction_id).distinct().subquery()
+        evaluated = func.count(Transaction.category_id)
+        # Only predictions still evaluated, i.e. whose transaction has a category
+        wrong = func.count(case((Transaction.category_id.isnot(None), corrected.c.transaction_id)))
+        
+        query = self.db.query(
+            Transaction.prediction_source,
+            Transaction.model_version,
+            func.count(Transaction.id),
+            evaluated,
+            wrong,
+            1.0 - cast(wrong, Float) / func.nullif(evaluated, 0),
+            func.avg(Transaction.prediction_confidence)
+        ).outerjoin(
+            corrected, corrected.c.transaction_id == Transaction.id
+        ).filter(Transaction.prediction_source.isnot(None))
+        if self.user_id is not None:
+            query = query.filter(Transaction.user_id == self.user_id)
+        rows = query.group_by(
+            Transaction.prediction_source, Transaction.model_version
+        ).order_by(Transaction.prediction_source, Transaction.model_version).all()
+        
+        return [
+            {
+                "source": source,
+                "model_version": model_version,
+                "predictions": predictions,
+                "evaluated": evaluated_count,
+                "corrected": corrected_count,
+                "precision": float(precision) if precision is not None else None,
+                "average_confidence": float(confidence) if confidence is not None else None
+            }
+            for source, model_version, predictions, evaluated_count, corrected_count, precision, confidence in rows
+        ]
+    
     def _normalize_text(self, text: str) -> str:
         """Normalize text for comparison"""
-        text = text.lower()
-        text = re.sub(r'[^a-z0-9\s]', '', text)
-        text = ' '.join(text.split())
-        return text
-    
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """Calculate similarity between two texts"""
-        return SequenceMatcher(None, text1, text2).ratio()
+        return normalize(text)
     
     def _get_other_category_id(self) -> Optional[int]:
         """Get the ID of the 'Other' category"""
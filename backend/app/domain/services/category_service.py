@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
+from app.domain.services.daily_aggregates import move_category
+from app.domain.services.statistics_cache import bump_data_version
 from app.models.category import Category
 from app.schemas.category import CategoryCreate, CategoryUpdate
 
@@ -35,6 +37,8 @@ class CategoryService:
         for key, value in update_data.items():
             setattr(category, key, value)
 
+        # Categories are shared, so every user's statistics may show the old name
+        bump_data_version(self.db, None)
         self.db.commit()
         self.db.refresh(category)
         return category
@@ -45,6 +49,9 @@ class CategoryService:
         if not category:
             return False
 
+        # The category's transactions become uncategorized
+        move_category(self.db, category_id)
+        bump_data_version(self.db, None)
         self.db.delete(category)
         self.db.commit()
         return True
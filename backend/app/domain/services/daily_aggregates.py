@@ -0,0 +1,201 @@
+"""
+Daily transaction aggregates read by the statistics endpoints
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.database import dialect_insert
+from app.models.daily_aggregate import AGGREGATE_KEY, DailyAggregate
+from app.models.transaction import Transaction, TransactionType
+
+# (user_id, day, transaction_type, category_id)
+AggregateKey = Tuple[Optional[int], date, TransactionType, Optional[int]]
+
+
+def _sort_key(key: AggregateKey):
+    user_id, day, transaction_type, category_id = key
+    return user_id or 0, day, transaction_type.value, category_id or 0
+
+
+class AggregateDeltas:
+    """
+    Changes to the daily aggregates made by one database transaction
+    
+    Services add the old state of a transaction with a negative sign and
+    the new state with a positive one, then apply() the net changes before
+    committing, so the aggregates change together with the transactions.
+    """
+    
+    def __init__(self):
+        self._deltas: Dict[AggregateKey, List] = defaultdict(lambda: [Decimal("0"), 0])
+    
+    def add(
+        self,
+        user_id: Optional[int],
+        transaction_date: datetime,
+        transaction_type: TransactionType,
+        category_id: Optional[int],
+        amount: Decimal,
+        count: int = 1
+    ):
+        day = transaction_date.date() if isinstance(transaction_date, datetime) else transaction_date
+        delta = self._deltas[(user_id, day, TransactionType(transaction_type), category_id)]
+        delta[0] += Decimal(amount)
+        delta[1] += count
+    
+    def add_transaction(self, transaction: Transaction, sign: int = 1):
+        self.add(
+            transaction.user_id,
+            transaction.transaction_date,
+            transaction.transaction_type,
+            transaction.category_id,
+            sign * Decimal(transaction.amount),
+            sign
+        )
+    
+    def apply(self, db: Session):
+        """
+        Write the net changes with one upsert, without committing
+        
+        Keys are written in a fixed order, so concurrent writers lock
+        aggregate rows in the same order. Rows left without transactions
+        are deleted.
+        """
+        changes = [
+            (key, delta) for key, delta in sorted(self._deltas.items(), key=lambda item: _sort_key(item[0]))
+            if delta[0] or delta[1]
+        ]
+        self._deltas.clear()
+        if not changes:
+            return
+        
+        table = DailyAggregate.__table__
+        statement = dialect_insert(db)(table).values([
+            {
+                "user_id": user_id,
+                "day": day,
+                "transaction_type": transaction_type,
+                "category_id": category_id,
+                "total_amount": amount,
+                "transaction_count": count
+            }
+            for (user_id, day, transaction_type, category_id), (amount, count) in changes
+        ])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=list(AGGREGATE_KEY),
+            set_={
+                "total_amount": table.c.total_amount + statement.excluded.total_amount,
+                "transaction_count": table.c.transaction_count + statement.excluded.transaction_count
+            }
+        ))
+        
+        emptied = {key[0] for key, (_, count) in changes if count < 0}
+        if emptied:
+            db.execute(table.delete().where(
+                AGGREGATE_KEY[0].in_([user_id or 0 for user_id in emptied]),
+                table.c.transaction_count == 0
+            ))
+
+
+def move_category(db: Session, category_id: int, new_category_id: Optional[int] = None):
+    """
+    Move the aggregates of a category's transactions to another category, without committing
+    
+    Call before the transactions themselves are moved, e.g. before a
+    category is deleted and its transactions become uncategorized.
+    """
+    rows = db.execute(
+        select(*_grouped_columns(), func.sum(Transaction.amount), func.count(Transaction.id))
+        .where(Transaction.category_id == category_id)
+        .group_by(*_grouped_columns())
+    ).all()
+    deltas = AggregateDeltas()
+    for user_id, day, transaction_type, _, amount, count in rows:
+        deltas.add(user_id, _as_date(day), transaction_type, category_id, -amount, -count)
+        deltas.add(user_id, _as_date(day), transaction_type, new_category_id, amount, count)
+    deltas.apply(db)
+
+
+def rebuild_daily_aggregates(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute the aggregates of one user, or of everyone, from transactions without committing
+    
+    Returns the number of aggregate rows written.
+    """
+    table = DailyAggregate.__table__
+    delete = table.delete()
+    source = select(*_grouped_columns(), func.sum(Transaction.amount), func.count(Transaction.id))
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+        source = source.where(Transaction.user_id == user_id)
+    
+    db.execute(delete)
+    return db.execute(
+        insert(table).from_select(
+            ["user_id", "day", "transaction_type", "category_id", "total_amount", "transaction_count"],
+            source.group_by(*_grouped_columns())
+        )
+    ).rowcount
+
+
+def find_drift(db: Session, user_id: Optional[int] = None) -> List[dict]:
+    """
+    Compare the aggregates with the transactions, returning every key whose totals differ
+    """
+    raw_query = select(*_grouped_columns(), func.sum(Transaction.amount), func.count(Transaction.id))
+    stored_query = select(
+        DailyAggregate.user_id,
+        DailyAggregate.day,
+        DailyAggregate.transaction_type,
+        DailyAggregate.category_id,
+        DailyAggregate.total_amount,
+        DailyAggregate.transaction_count
+    )
+    if user_id is not None:
+        raw_query = raw_query.where(Transaction.user_id == user_id)
+        stored_query = stored_query.where(DailyAggregate.user_id == user_id)
+    
+    raw = {
+        (row_user_id, _as_date(day), transaction_type, category_id): (Decimal(amount), count)
+        for row_user_id, day, transaction_type, category_id, amount, count
+        in db.execute(raw_query.group_by(*_grouped_columns()))
+    }
+    stored = {
+        (row_user_id, day, transaction_type, category_id): (Decimal(amount), count)
+        for row_user_id, day, transaction_type, category_id, amount, count in db.execute(stored_query)
+    }
+    
+    drift = []
+    for key in sorted(raw.keys() | stored.keys(), key=_sort_key):
+        expected = raw.get(key, (Decimal("0"), 0))
+        actual = stored.get(key, (Decimal("0"), 0))
+        if expected != actual:
+            row_user_id, day, transaction_type, category_id = key
+            drift.append({
+                "user_id": row_user_id,
+                "day": day,
+                "transaction_type": transaction_type.value,
+                "category_id": category_id,
+                "expected": {"total_amount": expected[0], "transaction_count": expected[1]},
+                "actual": {"total_amount": actual[0], "transaction_count": actual[1]}
+            })
+    return drift
+
+
+def _grouped_columns():
+    return (
+        Transaction.user_id,
+        func.date(Transaction.transaction_date),
+        Transaction.transaction_type,
+        Transaction.category_id
+    )
+
+
+def _as_date(value) -> date:
+    # SQLite returns date() as text
+    return date.fromisoformat(value) if isinstance(value, str) else value
@@ -5,6 +5,7 @@ from decimal import Decimal
 
 from app.models.deposit import Deposit, DepositStatus
 from app.models.account import Account
+from app.domain.services.statistics_cache import bump_data_version
 from app.domain.services.transaction_service import TransactionService
 from app.schemas.transaction import TransactionCreate
 from app.schemas.deposit import DepositCreate, DepositUpdate
@@ -55,6 +56,7 @@ class DepositService:
         )
         self.db.add(deposit)
         self._apply_account_balance_on_create(deposit)
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         self.db.refresh(deposit)
         return deposit
@@ -112,6 +114,7 @@ class DepositService:
             user_id=user_id
         )
 
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         self.db.refresh(deposit)
         return deposit
@@ -124,6 +127,7 @@ class DepositService:
 
         self._apply_account_balance_on_delete(deposit)
         self.db.delete(deposit)
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         return True
     
@@ -137,6 +141,7 @@ class DepositService:
             self._return_deposit_funds(deposit)
             self._create_interest_income(deposit)
         deposit.status = DepositStatus.COMPLETED
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         self.db.refresh(deposit)
         return deposit
@@ -0,0 +1,171 @@
+"""
+Compaction and pruning of categorization rules
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.domain.ml.rule_index import RuleIndex
+from app.domain.services.categorization_service import prediction_cache, rule_index
+from app.domain.services.rule_usage import rule_usage
+from app.models.categorization_rule import CategorizationRule
+
+logger = logging.getLogger(__name__)
+
+
+class RuleCompactionService:
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def compact(self) -> dict:
+        """
+        Merge near-identical rules and drop stale ones, returning before and after counts
+        
+        Rules of the same scope and category whose patterns are at least
+        RULE_MERGE_SIMILARITY alike are folded into the most applied one,
+        which takes over their counters. Afterwards rules not corrected for
+        RULE_PRUNE_MIN_AGE_DAYS are deleted if their confidence or
+        times_applied is below RULE_MIN_CONFIDENCE or RULE_MIN_TIMES_APPLIED.
+        Changes are committed every RULE_COMPACTION_CHUNK_SIZE rules, so no
+        transaction holds row locks for long.
+        """
+        started = time.perf_counter()
+        # Hits still in memory belong to rules that may be merged away
+        rule_usage.flush()
+        
+        rules_before = self._count()
+        merged = self._merge(self._clusters())
+        pruned = self._prune()
+        rules_after = self._count()
+        
+        if merged or pruned:
+            # Other processes notice the new table signature on their next check
+            rule_index.invalidate()
+            prediction_cache.clear()
+        
+        report = {
+            "rules_before": rules_before,
+            "merged": merged,
+            "pruned": pruned,
+            "rules_after": rules_after,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info("Compacted categorization rules: %s", report)
+        return report
+    
+    def _count(self) -> int:
+        return self.db.query(func.count(CategorizationRule.id)).scalar()
+    
+    def _clusters(self) -> Dict[int, Tuple[int, List[int]]]:
+        """
+        Map each surviving rule id to its category and the ids merged into it
+        
+        Rules are visited most applied first; each one joins the most
+        similar survivor of its scope and category or becomes a survivor.
+        """
+        rows = self.db.query(
+            CategorizationRule.id,
+            CategorizationRule.scope,
+            CategorizationRule.pattern,
+            CategorizationRule.category_id
+        ).order_by(CategorizationRule.times_applied.desc(), CategorizationRule.id).all()
+        self.db.commit()
+        
+        survivors: Dict[Tuple[str, int], RuleIndex] = defaultdict(RuleIndex)
+        clusters: Dict[int, Tuple[int, List[int]]] = {}
+        for rule_id, scope, pattern, category_id in rows:
+            index = survivors[(scope, category_id)]
+            match = index.match(pattern, settings.RULE_MERGE_SIMILARITY)
+            if match:
+                clusters[match[0]][1].append(rule_id)
+            else:
+                index.upsert(rule_id, pattern, category_id)
+                clusters[rule_id] = (category_id, [])
+        return {survivor: cluster for survivor, cluster in clusters.items() if cluster[1]}
+    
+    def _merge(self, clusters: Dict[int, Tuple[int, List[int]]]) -> int:
+        """
+        Add merged rules' counters to their survivor and delete them, one chunk per transaction
+        """
+        rules = CategorizationRule.__table__
+        merged = 0
+        pending = 0
+        for survivor_id, (category_id, rule_ids) in clusters.items():
+            # Counters are read in the same statement, so hits flushed since
+            # clustering are kept; rules corrected to another category since
+            # then are left alone
+            mergeable = rules.c.id.in_(rule_ids) & (rules.c.category_id == category_id)
+            merged_rules = select(rules).where(mergeable).subquery()
+            applied = select(func.coalesce(func.sum(merged_rules.c.times_applied), 0)).scalar_subquery()
+            correct = select(func.coalesce(func.sum(merged_rules.c.times_correct), 0)).scalar_subquery()
+            updated = self.db.execute(
+                rules.update()
+                .where(rules.c.id == survivor_id, rules.c.category_id == category_id)
+                .values(
+                    times_applied=rules.c.times_applied + applied,
+                    times_correct=rules.c.times_correct + correct,
+                    confidence=func.coalesce(
+                        cast(rules.c.times_correct + correct, Float)
+                        / func.nullif(rules.c.times_applied + applied, 0),
+                        rules.c.confidence
+                    )
+                )
+            )
+            if updated.rowcount:
+                merged += self.db.execute(rules.delete().where(mergeable)).rowcount
+            
+            pending += len(rule_ids) + 1
+            if pending >= settings.RULE_COMPACTION_CHUNK_SIZE:
+                self.db.commit()
+                pending = 0
+        self.db.commit()
+        return merged
+    
+    def _prune(self) -> int:
+        """
+        Delete stale low-confidence or rarely applied rules, walking ids in chunks
+        """
+        rules = CategorizationRule.__table__
+        cutoff = datetime.utcnow() - timedelta(days=settings.RULE_PRUNE_MIN_AGE_DAYS)
+        stale = (
+            (rules.c.updated_at < cutoff)
+            & (
+                (rules.c.confidence < settings.RULE_MIN_CONFIDENCE)
+                | (rules.c.times_applied < settings.RULE_MIN_TIMES_APPLIED)
+            )
+        )
+        
+        pruned = 0
+        last_id = 0
+        while True:
+            rule_ids = self.db.execute(
+                select(rules.c.id)
+                .where(stale, rules.c.id > last_id)
+                .order_by(rules.c.id)
+                .limit(settings.RULE_COMPACTION_CHUNK_SIZE)
+            ).scalars().all()
+            if not rule_ids:
+                break
+            # The condition is checked again in case a rule was corrected meanwhile
+            pruned += self.db.execute(rules.delete().where(rules.c.id.in_(rule_ids), stale)).rowcount
+            self.db.commit()
+            last_id = rule_ids[-1]
+        return pruned
+
+
+def compact_rules_job():
+    """Scheduler entry point"""
+    db = SessionLocal()
+    try:
+        RuleCompactionService(db).compact()
+    except Exception:
+        logger.exception("Categorization rule compaction failed")
+    finally:
+        db.close()
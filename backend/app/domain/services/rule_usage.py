@@ -0,0 +1,118 @@
+"""
+Write-behind counters for categorization rule usage
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable
+
+from sqlalchemy import Integer, bindparam, column, update, values
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.categorization_rule import CategorizationRule
+
+logger = logging.getLogger(__name__)
+
+
+class RuleUsageCounter:
+    """
+    Accumulates rule hits in memory and writes them in one batched UPDATE
+    
+    Prediction only records hits, so it never opens a write transaction.
+    flush() is called periodically by the scheduler and once at exit; a
+    crash loses at most the hits since the last flush. Counts from a
+    failed flush are put back and retried with the next one.
+    """
+    
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._pending: Dict[int, int] = Counter()
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.flushed_hits = 0
+    
+    def record(self, rule_ids: Iterable[int]):
+        """
+        Count one hit per rule id
+        """
+        with self._lock:
+            self._pending.update(rule_ids)
+    
+    def flush(self) -> int:
+        """
+        Add the pending hits to times_applied, returning the number of rules updated
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        
+        db = self._session_factory()
+        try:
+            self._apply(db, pending)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._pending.update(pending)
+            logger.exception("Failed to flush %s rule usage counters", len(pending))
+            raise
+        finally:
+            db.close()
+        
+        with self._lock:
+            self.flushes += 1
+            self.flushed_hits += sum(pending.values())
+        return len(pending)
+    
+    def _apply(self, db: Session, pending: Dict[int, int]):
+        rules = CategorizationRule.__table__
+        # Keep updated_at as is: counters are not rule changes, and the rule
+        # index reloads whenever the latest updated_at moves
+        if db.get_bind().dialect.name == 'postgresql':
+            hits = values(
+                column('rule_id', Integer),
+                column('hits', Integer),
+                name='hits'
+            ).data(sorted(pending.items()))
+            db.execute(
+                update(rules)
+                .where(rules.c.id == hits.c.rule_id)
+                .values(times_applied=rules.c.times_applied + hits.c.hits, updated_at=rules.c.updated_at)
+            )
+        else:
+            # SQLite (used by the scripts) has no VALUES alias with column names;
+            # one executemany UPDATE instead
+            db.execute(
+                update(rules)
+                .where(rules.c.id == bindparam('rule_id'))
+                .values(times_applied=rules.c.times_applied + bindparam('hits'), updated_at=rules.c.updated_at),
+                [{'rule_id': rule_id, 'hits': count} for rule_id, count in sorted(pending.items())]
+            )
+    
+    def get_stats(self) -> dict:
+        """
+        Get pending and flushed counts
+        """
+        with self._lock:
+            return {
+                'pending_rules': len(self._pending),
+                'pending_hits': sum(self._pending.values()),
+                'flushes': self.flushes,
+                'flushed_hits': self.flushed_hits
+            }
+
+
+def flush_rule_usage():
+    """Scheduler entry point; errors are logged and the hits retried next time"""
+    try:
+        rule_usage.flush()
+    except Exception:
+        pass
+
+
+# Shared by every service instance in this process
+rule_usage = RuleUsageCounter()
+atexit.register(flush_rule_usage)
@@ -0,0 +1,169 @@
+"""
+Cache of statistics responses keyed by the owner's data version
+"""
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+
+
+def bump_data_version(db: Session, user_ids: Optional[Iterable[Optional[int]]]):
+    """
+    Invalidate the cached statistics of some users, or of everyone when user_ids is None, without committing
+    
+    Call in the same transaction as the write, so the new version becomes
+    visible together with the data it describes.
+    """
+    users = User.__table__
+    statement = update(users).values(
+        data_version=users.c.data_version + 1,
+        # Not a profile change
+        updated_at=users.c.updated_at
+    )
+    if user_ids is not None:
+        user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+        if not user_ids:
+            return
+        statement = statement.where(users.c.id.in_(user_ids))
+    db.execute(statement)
+
+
+def cache_key(user_id: int, data_version: int, endpoint: str, params: dict) -> str:
+    """
+    Build a key that is the same for equal requests, whatever the parameter order
+    """
+    normalized = "&".join(
+        f"{name}={value.isoformat() if isinstance(value, (date, datetime)) else value}"
+        for name, value in sorted(params.items())
+        if value is not None
+    )
+    return f"statistics:{user_id}:{data_version}:{endpoint}:{normalized}"
+
+
+class StatisticsCacheBackend(ABC):
+    """
+    Storage for cached responses
+    
+    The in-process LRU is the default; a shared cache (e.g. Redis) only
+    has to implement get and set with string keys. Entries are never
+    invalidated explicitly: a write bumps the owner's data version, so
+    old keys are simply not read again.
+    """
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        pass
+    
+    @abstractmethod
+    def set(self, key: str, value: Any):
+        pass
+    
+    def clear(self):
+        pass
+    
+    def get_stats(self) -> dict:
+        return {}
+
+
+class InMemoryLRUBackend(StatisticsCacheBackend):
+    """
+    Bounded LRU of responses in this process
+    """
+    
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'evictions': self.evictions
+            }
+
+
+class StatisticsCache:
+    """
+    Maps (user_id, data_version, endpoint, params) to a computed response
+    
+    Hit and miss counters are kept per process, whatever the backend.
+    """
+    
+    def __init__(self, backend: StatisticsCacheBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_compute(
+        self,
+        user_id: int,
+        data_version: int,
+        endpoint: str,
+        params: dict,
+        compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Return the cached response, computing and storing it on a miss
+        """
+        key = cache_key(user_id, data_version, endpoint, params)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None:
+            value = compute()
+            self.backend.set(key, value)
+        return value
+    
+    def get_stats(self) -> dict:
+        """
+        Get hit/miss counters and backend details
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+        stats.update(self.backend.get_stats())
+        return stats
+
+
+# Shared by every request in this process
+statistics_cache = StatisticsCache(InMemoryLRUBackend(settings.STATISTICS_CACHE_SIZE))
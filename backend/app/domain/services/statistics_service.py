@@ -1,14 +1,24 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import DateTime, Interval, cast, func, literal, literal_column, null, select, union_all
 from datetime import date, datetime
 from typing import Optional, Dict, Any
 from decimal import Decimal
 
 from app.models.transaction import Transaction, TransactionType
 from app.models.category import Category
+from app.models.daily_aggregate import DailyAggregate
 from app.models.account import Account
 from app.models.deposit import Deposit, DepositStatus
 
+# generate_series step of each date_trunc unit
+TREND_STEPS = {
+    "day": "1 day",
+    "week": "1 week",
+    "month": "1 month",
+    "quarter": "3 months",
+    "year": "1 year"
+}
+
 
 class StatisticsService:
     def __init__(self, db: Session):
@@ -20,42 +30,45 @@ class StatisticsService:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
     ) -> Dict[str, Any]:
-        """Get overall transaction summary"""
-        query = self.db.query(Transaction)
-        if user_id is not None:
-            query = query.filter(Transaction.user_id == user_id)
+        """
+        Get overall transaction summary in one round trip
         
-        if start_date:
-            query = query.filter(Transaction.transaction_date >= start_date)
-        if end_date:
-            query = query.filter(Transaction.transaction_date <= end_date)
-        
-        total = query.with_entities(func.sum(Transaction.amount)).scalar() or 0
-        count = query.count()
-
-        expense_total = query.filter(Transaction.transaction_type == TransactionType.EXPENSE).with_entities(
-            func.sum(Transaction.amount)
-        ).scalar() or 0
-        income_total = query.filter(Transaction.transaction_type == TransactionType.INCOME).with_entities(
-            func.sum(Transaction.amount)
-        ).scalar() or 0
-        
-        total_balance_query = self.db.query(func.sum(Account.balance))
-        total_deposits_query = self.db.query(func.sum(Deposit.amount)).filter(
+        Transaction totals are conditional aggregates over the daily
+        aggregates, and the account and active deposit totals are scalar
+        subqueries of the same statement. Dates select whole days.
+        """
+        balance_query = select(func.coalesce(func.sum(Account.balance), 0))
+        deposits_query = select(func.coalesce(func.sum(Deposit.amount), 0)).where(
             Deposit.status == DepositStatus.ACTIVE
         )
         if user_id is not None:
-            total_balance_query = total_balance_query.filter(Account.user_id == user_id)
-            total_deposits_query = total_deposits_query.filter(Deposit.user_id == user_id)
-        total_balance = total_balance_query.scalar() or 0
-        total_deposits = total_deposits_query.scalar() or 0
+            balance_query = balance_query.where(Account.user_id == user_id)
+            deposits_query = deposits_query.where(Deposit.user_id == user_id)
+        
+        row = self.db.execute(
+            select(
+                func.coalesce(func.sum(DailyAggregate.transaction_count), 0).label("count"),
+                func.coalesce(
+                    func.sum(DailyAggregate.total_amount).filter(
+                        DailyAggregate.transaction_type == TransactionType.EXPENSE
+                    ), 0
+                ).label("expense_total"),
+                func.coalesce(
+                    func.sum(DailyAggregate.total_amount).filter(
+                        DailyAggregate.transaction_type == TransactionType.INCOME
+                    ), 0
+                ).label("income_total"),
+                balance_query.scalar_subquery().label("total_balance"),
+                deposits_query.scalar_subquery().label("total_deposits")
+            ).where(*self._aggregate_filter(user_id, start_date, end_date))
+        ).one()
         
         return {
-            "total_amount": float(expense_total),
-            "income_total": float(income_total),
-            "expense_total": float(expense_total),
-            "transaction_count": count,
-            "total_balance": float(total_balance + total_deposits),
+            "total_amount": float(row.expense_total),
+            "income_total": float(row.income_total),
+            "expense_total": float(row.expense_total),
+            "transaction_count": row.count,
+            "total_balance": float(row.total_balance + row.total_deposits),
             "start_date": start_date,
             "end_date": end_date
         }
@@ -70,18 +83,13 @@ class StatisticsService:
         category_label = func.coalesce(Category.name, "Без категории")
         query = self.db.query(
             category_label.label("category"),
-            func.sum(Transaction.amount).label("total"),
-            func.count(Transaction.id).label("count")
-        ).outerjoin(Category, Category.id == Transaction.category_id).filter(
-            Transaction.transaction_type == TransactionType.EXPENSE,
-            Transaction.user_id == user_id
+            func.sum(DailyAggregate.total_amount).label("total"),
+            func.sum(DailyAggregate.transaction_count).label("count")
+        ).outerjoin(Category, Category.id == DailyAggregate.category_id).filter(
+            DailyAggregate.transaction_type == TransactionType.EXPENSE,
+            *self._aggregate_filter(user_id, start_date, end_date)
         )
         
-        if start_date:
-            query = query.filter(Transaction.transaction_date >= start_date)
-        if end_date:
-            query = query.filter(Transaction.transaction_date <= end_date)
-        
         query = query.group_by(category_label)
         
         return [
@@ -93,33 +101,190 @@ class StatisticsService:
             for row in query.all()
         ]
 
-    def get_spending_trend(
+    def get_by_category_tree(
         self,
         user_id: int,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
+        end_date: Optional[datetime] = None,
+        parent_id: Optional[int] = None,
+        depth: Optional[int] = None
     ) -> list:
-        """Get monthly expense totals for trend chart"""
-        month_label = func.date_trunc("month", Transaction.transaction_date).label("month")
-        query = self.db.query(
-            month_label,
-            func.sum(Transaction.amount).label("total")
-        ).filter(
-            Transaction.transaction_type == TransactionType.EXPENSE,
-            Transaction.user_id == user_id
+        """
+        Get spending per category node, including all of its descendants, in one query
+        
+        A recursive CTE walks the hierarchy from the root categories, giving
+        each node its depth and every (ancestor, descendant) pair; each
+        node's totals are the per-category totals summed over its
+        descendants. parent_id and depth narrow the result to the level
+        being drilled into. Uncategorized spending is a root without an id.
+        """
+        spending = select(
+            DailyAggregate.category_id,
+            func.sum(DailyAggregate.total_amount).label("total"),
+            func.sum(DailyAggregate.transaction_count).label("count")
+        ).where(
+            DailyAggregate.transaction_type == TransactionType.EXPENSE,
+            *self._aggregate_filter(user_id, start_date, end_date)
+        ).group_by(DailyAggregate.category_id).cte("spending")
+        
+        # Starting from the roots keeps a parent_id cycle from recursing forever
+        child = aliased(Category)
+        levels = select(
+            Category.id,
+            literal_column("0").label("depth")
+        ).where(Category.parent_id.is_(None)).cte("levels", recursive=True)
+        levels = levels.union_all(
+            select(child.id, levels.c.depth + 1).join(levels, child.parent_id == levels.c.id)
         )
-
-        if start_date:
-            query = query.filter(Transaction.transaction_date >= start_date)
-        if end_date:
-            query = query.filter(Transaction.transaction_date <= end_date)
-
-        query = query.group_by(month_label).order_by(month_label.asc())
-
+        closure = select(
+            levels.c.id.label("ancestor_id"),
+            levels.c.id.label("descendant_id")
+        ).cte("closure", recursive=True)
+        closure = closure.union_all(
+            select(closure.c.ancestor_id, child.id).join(closure, child.parent_id == closure.c.descendant_id)
+        )
+        
+        nodes = select(
+            Category.id.label("category_id"),
+            Category.name.label("category"),
+            Category.parent_id,
+            levels.c.depth,
+            func.sum(spending.c.total).label("total"),
+            func.sum(spending.c.count).label("count")
+        ).join(levels, levels.c.id == Category.id).join(
+            closure, closure.c.ancestor_id == Category.id
+        ).join(
+            spending, spending.c.category_id == closure.c.descendant_id
+        ).group_by(Category.id, Category.name, Category.parent_id, levels.c.depth)
+        if parent_id is not None:
+            nodes = nodes.where(Category.parent_id == parent_id)
+        if depth is not None:
+            nodes = nodes.where(levels.c.depth == depth)
+        
+        if parent_id is None and depth in (None, 0):
+            uncategorized = select(
+                null().label("category_id"),
+                literal("Без категории").label("category"),
+                null().label("parent_id"),
+                literal_column("0").label("depth"),
+                spending.c.total,
+                spending.c.count
+            ).where(spending.c.category_id.is_(None))
+            nodes = union_all(nodes, uncategorized)
+        result = nodes.subquery()
+        
         return [
             {
-                "month": row.month.strftime("%Y-%m"),
+                "category_id": row.category_id,
+                "category": row.category,
+                "parent_id": row.parent_id,
+                "depth": row.depth,
                 "total": float(row.total),
+                # Postgres sums the per-category counts as numeric
+                "count": int(row.count)
             }
-            for row in query.all()
+            for row in self.db.execute(
+                select(result).order_by(result.c.depth, result.c.total.desc())
+            )
         ]
+
+    def get_spending_trend(
+        self,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        granularity: str = "month",
+        tz: str = "UTC"
+    ) -> list:
+        """
+        Get income and expense totals per period for the trend chart, empty periods included
+        
+        Both series come from one grouped scan with conditional aggregates,
+        and generate_series fills the periods without transactions. Dates
+        are wall times in tz; transaction dates are stored as UTC. In UTC
+        the daily aggregates are bucketed, elsewhere the transactions
+        themselves, found through the (user_id, transaction_date) index.
+        Without a start or end date the series starts or ends with the
+        first or last period that has transactions.
+        """
+        if granularity not in TREND_STEPS:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        # Typed, so date_trunc and timezone resolve to their timestamp variants
+        local_start = cast(start_date, DateTime) if start_date else None
+        local_end = cast(end_date, DateTime) if end_date else None
+        
+        if tz == "UTC":
+            source = select(
+                cast(DailyAggregate.day, DateTime).label("local_time"),
+                DailyAggregate.transaction_type,
+                DailyAggregate.total_amount.label("amount")
+            ).where(*self._aggregate_filter(user_id, start_date, end_date))
+        else:
+            conditions = [Transaction.user_id == user_id]
+            # Bounds are converted to UTC rather than every row to local time,
+            # so the index range scan still applies
+            if start_date:
+                conditions.append(Transaction.transaction_date >= func.timezone("UTC", func.timezone(tz, local_start)))
+            if end_date:
+                conditions.append(Transaction.transaction_date <= func.timezone("UTC", func.timezone(tz, local_end)))
+            source = select(
+                func.timezone(tz, func.timezone("UTC", Transaction.transaction_date)).label("local_time"),
+                Transaction.transaction_type,
+                Transaction.amount.label("amount")
+            ).where(*conditions)
+        source = source.cte("source")
+        
+        # Inlined rather than bound, so the grouped and selected expressions are identical
+        unit = literal_column(f"'{granularity}'")
+        period = func.date_trunc(unit, source.c.local_time)
+        totals = select(
+            period.label("period"),
+            func.sum(source.c.amount).filter(source.c.transaction_type == TransactionType.EXPENSE).label("expense"),
+            func.sum(source.c.amount).filter(source.c.transaction_type == TransactionType.INCOME).label("income")
+        ).group_by(period).cte("totals")
+        
+        first = (
+            func.date_trunc(unit, local_start) if start_date
+            else select(func.min(totals.c.period)).scalar_subquery()
+        )
+        last = (
+            func.date_trunc(unit, local_end) if end_date
+            else select(func.max(totals.c.period)).scalar_subquery()
+        )
+        periods = select(
+            func.generate_series(first, last, cast(literal(TREND_STEPS[granularity]), Interval)).label("period")
+        ).cte("periods")
+        
+        query = select(
+            periods.c.period,
+            func.coalesce(totals.c.expense, 0).label("expense"),
+            func.coalesce(totals.c.income, 0).label("income")
+        ).outerjoin(totals, totals.c.period == periods.c.period).order_by(periods.c.period)
+        
+        return [
+            {
+                "period": row.period.date().isoformat(),
+                # Kept for clients written for the monthly expense series
+                "month": row.period.strftime("%Y-%m"),
+                "total": float(row.expense),
+                "expense": float(row.expense),
+                "income": float(row.income)
+            }
+            for row in self.db.execute(query)
+        ]
+
+    def _aggregate_filter(
+        self,
+        user_id: Optional[int],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime]
+    ) -> list:
+        """Daily aggregate conditions for a user and the days the range touches"""
+        conditions = []
+        if user_id is not None:
+            conditions.append(DailyAggregate.user_id == user_id)
+        if start_date:
+            conditions.append(DailyAggregate.day >= start_date.date())
+        if end_date:
+            conditions.append(DailyAggregate.day <= end_date.date())
+        return conditions
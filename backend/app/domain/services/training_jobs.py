@@ -0,0 +1,209 @@
+"""
+Background training jobs for the categorization model
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.domain.ml.registry import user_scope
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = Path("app/domain/ml/models/jobs")
+
+
+class TrainingJobConflictError(RuntimeError):
+    """Raised when a scope already has a training job in flight"""
+    
+    def __init__(self, job_id: str):
+        super().__init__(f"Training job {job_id} is already running")
+        self.job_id = job_id
+
+
+def _write_progress(path: Path, progress: dict):
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def _run_training_job(progress_path: str, user_id: Optional[int]) -> dict:
+    """
+    Worker-process entry point: train from the database and save a new model version
+    """
+    # Imported here so the worker sets up its own engine and model registry
+    from app.core.database import SessionLocal
+    from app.domain.services.categorization_service import CategorizationService
+    
+    path = Path(progress_path)
+    started_at = datetime.utcnow().isoformat()
+    _write_progress(path, {"started_at": started_at, "rows_processed": 0, "total_rows": None})
+    
+    def report(rows_processed: int, total_rows: int):
+        _write_progress(path, {
+            "started_at": started_at,
+            "rows_processed": rows_processed,
+            "total_rows": total_rows
+        })
+    
+    db = SessionLocal()
+    try:
+        return CategorizationService(db, user_id).train_ml_model(progress=report)
+    finally:
+        db.close()
+
+
+class TrainingJobManager:
+    """
+    Runs model training on a process pool, at most one job per model scope
+    
+    Jobs save a new model version from the worker process; the version
+    switch is atomic on disk and the model registry swaps the loaded model
+    under its lock, so requests see either the old model or the new one.
+    Job records live in memory of the API process and the most recent
+    finished ones are kept for status queries.
+    """
+    
+    def __init__(self, jobs_dir: Path = JOBS_DIR, max_workers: int = 1, keep_finished: int = 50):
+        self.jobs_dir = jobs_dir
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._active: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, user_id: Optional[int] = None) -> dict:
+        """
+        Queue a training job for a user's model (the global one without a user)
+        
+        Raises TrainingJobConflictError if that model already has a job in flight.
+        """
+        scope = user_scope(user_id)
+        with self._lock:
+            active_id = self._active.get(scope)
+            if active_id:
+                raise TrainingJobConflictError(active_id)
+            
+            job_id = uuid.uuid4().hex
+            self.jobs_dir.mkdir(parents=True, exist_ok=True)
+            job = {
+                "id": job_id,
+                "scope": scope,
+                "status": "queued",
+                "created_at": datetime.utcnow(),
+                "started_at": None,
+                "finished_at": None,
+                "duration_seconds": None,
+                "rows_processed": 0,
+                "total_rows": None,
+                "result": None,
+                "error": None,
+                "_progress_path": self.jobs_dir / f"{job_id}.json",
+            }
+            future = self._get_executor().submit(
+                _run_training_job, str(job["_progress_path"]), user_id
+            )
+            self._jobs[job_id] = job
+            self._active[scope] = job_id
+        
+        future.add_done_callback(partial(self._finish, job_id))
+        return self.get(job_id)
+    
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Get a job's status, progress, duration and result
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["finished_at"] is None:
+                self._read_progress(job)
+            return {key: value for key, value in job.items() if not key.startswith("_")}
+    
+    def shutdown(self):
+        """
+        Stop the worker pool, cancelling jobs that have not started
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers do not inherit the API process' connections or threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+    
+    def _read_progress(self, job: dict):
+        try:
+            with open(job["_progress_path"], encoding="utf-8") as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return
+        job["status"] = "running"
+        job["started_at"] = datetime.fromisoformat(progress["started_at"])
+        job["rows_processed"] = progress["rows_processed"]
+        job["total_rows"] = progress["total_rows"]
+    
+    def _finish(self, job_id: str, future: Future):
+        try:
+            result = future.result()
+            error = None if result.get("success") else result.get("message")
+        except BrokenProcessPool as exc:
+            result, error = None, f"Training worker died: {exc}"
+            with self._lock:
+                self._executor = None
+        except BaseException as exc:
+            result, error = None, str(exc) or exc.__class__.__name__
+        
+        if error is None:
+            # Load the new version now instead of on the next request
+            from app.domain.services.categorization_service import model_registry
+            try:
+                model_registry.get(self._jobs[job_id]["scope"])
+            except Exception:
+                logger.exception("Failed to load model trained by job %s", job_id)
+        else:
+            logger.warning("Training job %s failed: %s", job_id, error)
+        
+        with self._lock:
+            job = self._jobs[job_id]
+            self._read_progress(job)
+            job["_progress_path"].unlink(missing_ok=True)
+            job["finished_at"] = datetime.utcnow()
+            if job["started_at"] is not None:
+                job["duration_seconds"] = round(
+                    (job["finished_at"] - job["started_at"]).total_seconds(), 3
+                )
+            job["status"] = "failed" if error else "succeeded"
+            job["result"] = result
+            job["error"] = error
+            if self._active.get(job["scope"]) == job_id:
+                del self._active[job["scope"]]
+            self._prune()
+    
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is not None]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+
+# Shared by the API process; workers are started on first use
+training_jobs = TrainingJobManager(max_workers=settings.CATEGORIZER_TRAINING_WORKERS)
@@ -1,10 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import insert, literal, select
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
+from app.core.config import settings
+from app.domain.services.auto_categorization import auto_categorization
+from app.domain.services.categorization_service import CategorizationService
+from app.domain.services.daily_aggregates import AggregateDeltas
+from app.domain.services.statistics_cache import bump_data_version
 from app.models.transaction import Transaction, TransactionType
+from app.models.user_correction import UserCorrection
 from app.models.account import Account
 from app.schemas.transaction import TransactionCreate, TransactionUpdate
 
@@ -48,8 +54,15 @@ class TransactionService:
         db_transaction = Transaction(**transaction.model_dump(), user_id=user_id)
         self.db.add(db_transaction)
         self._apply_account_balance_on_create(db_transaction)
+        # Flushed first so column defaults such as the type are set
+        self.db.flush()
+        deltas = AggregateDeltas()
+        deltas.add_transaction(db_transaction)
+        deltas.apply(self.db)
+        bump_data_version(self.db, [user_id])
         self.db.commit()
         self.db.refresh(db_transaction)
+        self._queue_categorization(db_transaction)
         return db_transaction
     
     def update_transaction(
@@ -59,10 +72,12 @@ class TransactionService:
         user_id: int
     ) -> Optional[Transaction]:
         """Update a transaction"""
-        db_transaction = self.get_transaction(transaction_id, user_id)
+        db_transaction = self._get_transaction_for_update(transaction_id, user_id)
         if not db_transaction:
             return None
         
+        deltas = AggregateDeltas()
+        deltas.add_transaction(db_transaction, -1)
         old_account_id = db_transaction.account_id
         old_amount = Decimal(db_transaction.amount)
         old_type = db_transaction.transaction_type
@@ -71,6 +86,14 @@ class TransactionService:
         if "account_id" in update_data and update_data["account_id"]:
             if not self._get_account_for_user(update_data["account_id"], user_id):
                 raise ValueError("Account not found")
+        new_category_id = update_data.get("category_id")
+        if new_category_id is not None:
+            # Feeds the prediction precision statistics
+            self._record_corrections(
+                Transaction.id == transaction_id,
+                Transaction.category_id.is_distinct_from(new_category_id),
+                new_category_id=new_category_id
+            )
         for key, value in update_data.items():
             setattr(db_transaction, key, value)
 
@@ -82,6 +105,9 @@ class TransactionService:
             new_amount=Decimal(db_transaction.amount),
             new_type=db_transaction.transaction_type
         )
+        deltas.add_transaction(db_transaction)
+        deltas.apply(self.db)
+        bump_data_version(self.db, [user_id])
 
         self.db.commit()
         self.db.refresh(db_transaction)
@@ -90,17 +116,49 @@ class TransactionService:
     
     def delete_transaction(self, transaction_id: int, user_id: int) -> bool:
         """Delete a transaction"""
-        db_transaction = self.get_transaction(transaction_id, user_id)
+        db_transaction = self._get_transaction_for_update(transaction_id, user_id)
         if not db_transaction:
             return False
 
         self._apply_account_balance_on_delete(db_transaction)
+        deltas = AggregateDeltas()
+        deltas.add_transaction(db_transaction, -1)
+        deltas.apply(self.db)
+        bump_data_version(self.db, [user_id])
         self.db.delete(db_transaction)
         self.db.commit()
         return True
     
     def bulk_categorize(self, category_id: int, transaction_ids: List[int], user_id: int) -> int:
         """Bulk update category for multiple transactions"""
+        moved = self.db.execute(
+            select(
+                Transaction.id,
+                Transaction.description,
+                Transaction.user_id,
+                Transaction.transaction_date,
+                Transaction.transaction_type,
+                Transaction.category_id,
+                Transaction.amount
+            ).where(
+                Transaction.id.in_(transaction_ids),
+                Transaction.user_id == user_id,
+                Transaction.category_id.is_distinct_from(category_id)
+            ).with_for_update()
+        ).all()
+        deltas = AggregateDeltas()
+        for _, _, owner_id, transaction_date, transaction_type, old_category_id, amount in moved:
+            deltas.add(owner_id, transaction_date, transaction_type, old_category_id, -amount, -1)
+            deltas.add(owner_id, transaction_date, transaction_type, category_id, amount)
+        deltas.apply(self.db)
+        if moved:
+            bump_data_version(self.db, [user_id])
+        self._record_corrections(
+            Transaction.id.in_(transaction_ids),
+            Transaction.user_id == user_id,
+            Transaction.category_id.is_distinct_from(category_id),
+            new_category_id=category_id
+        )
         count = self.db.query(Transaction).filter(
             Transaction.id.in_(transaction_ids),
             Transaction.user_id == user_id
@@ -108,9 +166,48 @@ class TransactionService:
             {Transaction.category_id: category_id},
             synchronize_session=False
         )
+        # Rules and models learn from the whole batch; the corrections are
+        # already logged above. Commits together with the move.
+        CategorizationService(self.db, user_id).learn_from_corrections(
+            [
+                (transaction_id, old_category_id, category_id, description)
+                for transaction_id, description, _, _, _, old_category_id, _ in moved
+            ],
+            record=False
+        )
         self.db.commit()
         return count
 
+    def _get_transaction_for_update(self, transaction_id: int, user_id: int) -> Optional[Transaction]:
+        """Get a transaction locked until commit, so its aggregate deltas cannot interleave"""
+        return self.db.query(Transaction).filter(
+            Transaction.id == transaction_id,
+            Transaction.user_id == user_id
+        ).with_for_update().populate_existing().first()
+
+    def _record_corrections(self, *filters, new_category_id: int) -> None:
+        """Log a user correction for every predicted transaction moved off its prediction"""
+        self.db.execute(
+            insert(UserCorrection).from_select(
+                ["transaction_id", "old_category_id", "new_category_id"],
+                select(Transaction.id, Transaction.category_id, literal(new_category_id)).where(
+                    *filters,
+                    Transaction.prediction_source.isnot(None),
+                    Transaction.predicted_category_id.is_distinct_from(new_category_id)
+                )
+            )
+        )
+
+    def _queue_categorization(self, transaction: Transaction) -> None:
+        """Predict a category after the insert without making the caller wait"""
+        if (
+            not settings.AUTO_CATEGORIZATION_ENABLED
+            or transaction.category_id is not None
+            or transaction.transaction_type != TransactionType.EXPENSE
+        ):
+            return
+        auto_categorization.enqueue([transaction.id])
+
     def _get_account_for_user(self, account_id: int, user_id: int) -> Optional[Account]:
         return self.db.query(Account).filter(Account.id == account_id, Account.user_id == user_id).first()
 
@@ -1,14 +1,21 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
-from app.api import transactions, categories, statistics, telegram, export, accounts, deposits, auth
+from app.api import transactions, categories, categorization, statistics, telegram, export, accounts, deposits, auth
 from app.core.config import settings
 from app.core.database import SessionLocal
+from app.core.security import get_current_user
+from app.domain.services.auto_categorization import auto_categorization
+from app.domain.services.back_categorization import back_categorization
 from app.domain.services.deposit_service import DepositService
+from app.domain.services.rule_compaction import compact_rules_job
+from app.domain.services.rule_usage import flush_rule_usage
+from app.domain.services.training_jobs import training_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +42,26 @@ async def lifespan(app: FastAPI):
         id="close_overdue_deposits",
         replace_existing=True
     )
+    scheduler.add_job(
+        compact_rules_job,
+        CronTrigger(hour=3, minute=30),
+        id="compact_categorization_rules",
+        replace_existing=True
+    )
+    scheduler.add_job(
+        flush_rule_usage,
+        IntervalTrigger(seconds=settings.RULE_USAGE_FLUSH_SECONDS),
+        id="flush_rule_usage",
+        replace_existing=True
+    )
     scheduler.start()
     yield
     # Shutdown
     scheduler.shutdown()
+    back_categorization.shutdown()
+    auto_categorization.shutdown()
+    flush_rule_usage()
+    training_jobs.shutdown()
     print("Shutting down...")
 
 
@@ -60,6 +83,12 @@ app.add_middleware(
 # Include routers
 app.include_router(transactions.router, prefix="/api/transactions", tags=["transactions"])
 app.include_router(categories.router, prefix="/api/categories", tags=["categories"])
+app.include_router(
+    categorization.router,
+    prefix="/api/categorization",
+    tags=["categorization"],
+    dependencies=[Depends(get_current_user)]
+)
 app.include_router(statistics.router, prefix="/api/statistics", tags=["statistics"])
 app.include_router(telegram.router, prefix="/api/telegram", tags=["telegram"])
 app.include_router(export.router, prefix="/api/export", tags=["export"])
@@ -6,3 +6,4 @@ from app.models.category import Category
 from app.models.user_correction import UserCorrection
 from app.models.categorization_rule import CategorizationRule
 from app.models.user import User
+from app.models.daily_aggregate import DailyAggregate
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -7,10 +7,15 @@ from app.core.database import Base
 
 class CategorizationRule(Base):
     __tablename__ = "categorization_rules"
+    __table_args__ = (
+        Index("ux_categorization_rules_scope_pattern", "scope", "pattern", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    # Whose corrections the rule was learned from, see app.domain.ml.registry
+    scope = Column(String(32), nullable=False, default="global", server_default="global")
     pattern = Column(String(200), nullable=False, index=True)
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=False, index=True)
     
     # Learning metrics
     confidence = Column(Float, nullable=False, default=0.0)
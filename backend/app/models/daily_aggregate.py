@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, Numeric, Date, ForeignKey, Enum, Index, literal_column
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+from app.models.transaction import TransactionType
+
+
+class DailyAggregate(Base):
+    """Per-day transaction totals, kept in step with transactions by app.domain.services.daily_aggregates"""
+    __tablename__ = "daily_aggregates"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    day = Column(Date, nullable=False)
+    transaction_type = Column(
+        Enum(
+            TransactionType,
+            values_callable=lambda enum_cls: [member.value for member in enum_cls],
+            name="transactiontype"
+        ),
+        nullable=False
+    )
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+
+# Transactions without an owner or category are aggregated too, so NULLs
+# take part in the key as 0
+AGGREGATE_KEY = (
+    func.coalesce(DailyAggregate.user_id, literal_column("0")),
+    DailyAggregate.day,
+    DailyAggregate.transaction_type,
+    func.coalesce(DailyAggregate.category_id, literal_column("0")),
+)
+
+Index("ux_daily_aggregates_key", *AGGREGATE_KEY, unique=True)
+Index("ix_daily_aggregates_user_id_day", DailyAggregate.user_id, DailyAggregate.day)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, Enum, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -13,6 +13,10 @@ class TransactionType(str, enum.Enum):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Date range scans of one user's transactions, e.g. the statistics trend
+        Index("ix_transactions_user_id_transaction_date", "user_id", "transaction_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
@@ -34,6 +38,14 @@ class Transaction(Base):
     # Foreign key to category
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     
+    # What the categorizer predicted, kept when a user changes category_id
+    predicted_category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
+    prediction_confidence = Column(Float, nullable=True)
+    # "ml", "rule" or "other"
+    prediction_source = Column(String(16), nullable=True)
+    # Model scope and version, e.g. "global/v3"; empty for rule matches
+    model_version = Column(String(64), nullable=True)
+    
     # Telegram metadata
     telegram_message_id = Column(Integer, nullable=True)
     raw_text = Column(Text, nullable=True)
@@ -44,5 +56,5 @@ class Transaction(Base):
     
     # Relationships
     user = relationship("User", back_populates="transactions")
-    category = relationship("Category", back_populates="transactions")
+    category = relationship("Category", back_populates="transactions", foreign_keys=[category_id])
     account = relationship("Account", back_populates="transactions")
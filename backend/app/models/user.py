@@ -16,6 +16,8 @@ class User(Base):
     telegram_username = Column(String(64), nullable=True)
     telegram_link_code = Column(String(32), nullable=True, index=True)
     telegram_link_code_expires_at = Column(DateTime, nullable=True)
+    # Bumped by every write that changes the user's statistics, see app.domain.services.statistics_cache
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
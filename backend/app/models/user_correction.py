@@ -9,9 +9,10 @@ class UserCorrection(Base):
     __tablename__ = "user_corrections"
     
     id = Column(Integer, primary_key=True, index=True)
-    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=False, index=True)
-    old_category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
-    new_category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), nullable=False, index=True)
+    old_category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
+    # A correction to a deleted category is deleted with it
+    new_category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
     
     # Timestamp
     created_at = Column(DateTime, server_default=func.now())
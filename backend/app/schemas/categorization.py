@@ -0,0 +1,61 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class PredictBatchRequest(BaseModel):
+    descriptions: List[str] = Field(..., min_length=1, max_length=5000)
+
+
+class CategoryPredictionResponse(BaseModel):
+    description: str
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+
+
+class PredictBatchResponse(BaseModel):
+    predictions: List[CategoryPredictionResponse]
+
+
+class TrainingJobResponse(BaseModel):
+    id: str
+    scope: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    rows_processed: int = 0
+    total_rows: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class BackCategorizationResponse(BaseModel):
+    user_id: int
+    status: str
+    min_confidence: float
+    last_id: int
+    rows_processed: int
+    rows_categorized: int
+    total_rows: int
+    elapsed_seconds: float
+    rows_per_second: Optional[float] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class PredictionPrecisionResponse(BaseModel):
+    source: str
+    model_version: Optional[str] = None
+    predictions: int
+    evaluated: int
+    corrected: int
+    precision: Optional[float] = None
+    average_confidence: Optional[float] = None
+    
+    class Config:
+        # model_version is a field, not pydantic's model_ namespace
+        protected_namespaces = ()
@@ -37,6 +37,7 @@ class TransactionResponse(TransactionBase):
     id: int
     category_id: Optional[int] = None
     category_name: Optional[str] = None
+    prediction_confidence: Optional[float] = None
     account_id: Optional[int] = None
     account_name: Optional[str] = None
     created_at: datetime
@@ -0,0 +1,51 @@
+"""Add scope to categorization rules and make (scope, pattern) unique
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "categorization_rules",
+        sa.Column("scope", sa.String(length=32), nullable=False, server_default="global"),
+    )
+
+    # Concurrent corrections could insert the same pattern twice; keep the
+    # most recently updated rule of each pattern
+    op.execute(
+        """
+        DELETE FROM categorization_rules
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY scope, pattern
+                    ORDER BY updated_at DESC NULLS LAST, id DESC
+                ) AS position
+                FROM categorization_rules
+            ) ranked
+            WHERE position > 1
+        )
+        """
+    )
+
+    op.create_index(
+        "ux_categorization_rules_scope_pattern",
+        "categorization_rules",
+        ["scope", "pattern"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_categorization_rules_scope_pattern", table_name="categorization_rules")
+    op.drop_column("categorization_rules", "scope")
@@ -0,0 +1,22 @@
+"""Add prediction confidence to transactions
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("transactions", sa.Column("prediction_confidence", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("transactions", "prediction_confidence")
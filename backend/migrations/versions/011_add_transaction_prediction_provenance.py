@@ -0,0 +1,37 @@
+"""Add prediction provenance to transactions
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "011"
+down_revision = "010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("transactions", sa.Column("predicted_category_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "fk_transactions_predicted_category_id_categories",
+        "transactions",
+        "categories",
+        ["predicted_category_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    op.add_column("transactions", sa.Column("prediction_source", sa.String(length=16), nullable=True))
+    op.add_column("transactions", sa.Column("model_version", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("transactions", "model_version")
+    op.drop_column("transactions", "prediction_source")
+    op.drop_constraint(
+        "fk_transactions_predicted_category_id_categories", "transactions", type_="foreignkey"
+    )
+    op.drop_column("transactions", "predicted_category_id")
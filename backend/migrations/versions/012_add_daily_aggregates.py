@@ -0,0 +1,59 @@
+"""Add daily transaction aggregates
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "012"
+down_revision = "011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_aggregates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column(
+            "transaction_type",
+            postgresql.ENUM("expense", "income", name="transactiontype", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id"), nullable=True),
+        sa.Column("total_amount", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("transaction_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index(
+        "ux_daily_aggregates_key",
+        "daily_aggregates",
+        [
+            sa.text("coalesce(user_id, 0)"),
+            "day",
+            "transaction_type",
+            sa.text("coalesce(category_id, 0)"),
+        ],
+        unique=True,
+    )
+    op.create_index("ix_daily_aggregates_user_id_day", "daily_aggregates", ["user_id", "day"])
+
+    op.execute(
+        """
+        INSERT INTO daily_aggregates (user_id, day, transaction_type, category_id, total_amount, transaction_count)
+        SELECT user_id, date(transaction_date), transaction_type, category_id, sum(amount), count(*)
+        FROM transactions
+        GROUP BY user_id, date(transaction_date), transaction_type, category_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_daily_aggregates_user_id_day", table_name="daily_aggregates")
+    op.drop_index("ux_daily_aggregates_key", table_name="daily_aggregates")
+    op.drop_table("daily_aggregates")
@@ -0,0 +1,25 @@
+"""Add (user_id, transaction_date) index to transactions
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "014"
+down_revision = "013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_transactions_user_id_transaction_date",
+        "transactions",
+        ["user_id", "transaction_date"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_user_id_transaction_date", table_name="transactions")
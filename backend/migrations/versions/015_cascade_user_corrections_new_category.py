@@ -0,0 +1,38 @@
+"""Delete user corrections together with the category they moved a transaction to
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "015"
+down_revision = "014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # RESTRICT made every category a user had corrected to impossible to delete
+    op.drop_constraint("user_corrections_new_category_id_fkey", "user_corrections", type_="foreignkey")
+    op.create_foreign_key(
+        "user_corrections_new_category_id_fkey",
+        "user_corrections",
+        "categories",
+        ["new_category_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("user_corrections_new_category_id_fkey", "user_corrections", type_="foreignkey")
+    op.create_foreign_key(
+        "user_corrections_new_category_id_fkey",
+        "user_corrections",
+        "categories",
+        ["new_category_id"],
+        ["id"],
+        ondelete="RESTRICT",
+    )
@@ -3,13 +3,34 @@ Run the Telegram bot in polling mode
 This script should be run separately from the FastAPI server
 """
 import asyncio
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
 from app.bot.telegram_bot import create_bot
+from app.core.config import settings
+from app.domain.services.auto_categorization import auto_categorization
+from app.domain.services.rule_usage import flush_rule_usage
 
 
 def main():
     """Main entry point for the bot"""
-    bot = create_bot()
-    bot.run()
+    # Transactions created by the bot are categorized in this process, so it
+    # flushes its own rule usage counters
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(
+        flush_rule_usage,
+        IntervalTrigger(seconds=settings.RULE_USAGE_FLUSH_SECONDS),
+        id="flush_rule_usage",
+        replace_existing=True
+    )
+    scheduler.start()
+    try:
+        bot = create_bot()
+        bot.run()
+    finally:
+        scheduler.shutdown()
+        auto_categorization.shutdown()
+        flush_rule_usage()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+"""
+Categorize users' uncategorized expense history in resumable chunks
+Progress is checkpointed after every chunk; stop with Ctrl+C and run the
+same command again to continue where it stopped.
+"""
+import argparse
+import signal
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import distinct  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.domain.services.back_categorization import BackCategorizationJob  # noqa: E402
+from app.domain.services.rule_usage import flush_rule_usage  # noqa: E402
+from app.models.transaction import Transaction  # noqa: E402
+
+
+def print_progress(state: dict):
+    total = state["total_rows"] or 0
+    print(
+        f"user {state['user_id']}: {state['rows_processed']}/{total} rows, "
+        f"{state['rows_categorized']} categorized, {state['rows_per_second'] or 0:.0f} rows/s, "
+        f"last id {state['last_id']} [{state['status']}]"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    users = parser.add_mutually_exclusive_group(required=True)
+    users.add_argument("--user-id", type=int, action="append", help="User to process (repeatable)")
+    users.add_argument("--all", action="store_true", help="Every user with uncategorized transactions")
+    parser.add_argument("--min-confidence", type=float, default=settings.BACK_CATEGORIZATION_MIN_CONFIDENCE)
+    parser.add_argument("--chunk-size", type=int, default=settings.BACK_CATEGORIZATION_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints and start from the first row")
+    args = parser.parse_args()
+
+    stopping = []
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    db = SessionLocal()
+    try:
+        user_ids = args.user_id
+        if args.all:
+            user_ids = [
+                user_id for (user_id,) in db.query(distinct(Transaction.user_id)).filter(
+                    Transaction.user_id.isnot(None),
+                    Transaction.category_id.is_(None)
+                ).order_by(Transaction.user_id)
+            ]
+
+        for user_id in user_ids:
+            if stopping:
+                break
+            job = BackCategorizationJob(db, user_id, args.min_confidence, chunk_size=args.chunk_size)
+            state = job.run(job.prepare(args.restart), should_stop=lambda: bool(stopping), progress=print_progress)
+            if state["status"] == "failed":
+                print(f"user {user_id}: failed: {state['error']}")
+    finally:
+        db.close()
+        flush_rule_usage()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark for MLCategorizer prediction latency
+Trains on synthetic data and reports per-call latency by category count
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# The ML package imports the ORM models; no database is touched here
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.domain.ml.categorizer import MLCategorizer  # noqa: E402
+
+
+WORDS = [
+    "coffee", "taxi", "market", "pizza", "cinema", "pharmacy", "fuel", "books",
+    "gym", "rent", "salary", "bakery", "metro", "flowers", "hotel", "airline",
+    "sushi", "burger", "grocery", "phone", "internet", "insurance", "repair", "shoes",
+]
+
+
+def make_transactions(num_categories: int, samples_per_category: int, rng: random.Random) -> list:
+    """Generate synthetic labeled transactions, one merchant token per category"""
+    transactions = []
+    for cat_id in range(1, num_categories + 1):
+        merchant = f"merchant{cat_id}"
+        for _ in range(samples_per_category):
+            words = rng.sample(WORDS, 2)
+            transactions.append(
+                SimpleNamespace(
+                    category_id=cat_id,
+                    description=f"{merchant} {words[0]} {words[1]}"
+                )
+            )
+    return transactions
+
+
+def benchmark(
+    num_categories: int,
+    samples_per_category: int,
+    calls: int,
+    rng: random.Random,
+    mode: str = "centroid"
+) -> dict:
+    categorizer = MLCategorizer(min_samples=3, model_path=Path(tempfile.mkdtemp()), mode=mode)
+    categorizer.train(make_transactions(num_categories, samples_per_category, rng))
+
+    queries = [
+        f"merchant{rng.randint(1, num_categories)} {rng.choice(WORDS)}"
+        for _ in range(calls)
+    ]
+
+    # Warm-up
+    for query in queries[:10]:
+        categorizer.predict_top_k(query, k=5)
+
+    started = time.perf_counter()
+    for query in queries:
+        categorizer.predict(query)
+    predict_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for query in queries:
+        categorizer.predict_top_k(query, k=5)
+    top_k_elapsed = time.perf_counter() - started
+
+    return {
+        "categories": num_categories,
+        "rows": num_categories * samples_per_category,
+        "predict_us": predict_elapsed / calls * 1e6,
+        "top_k_us": top_k_elapsed / calls * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--samples", type=int, default=5, help="Training samples per category")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=["centroid", "knn"], default="centroid")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'categories':>10} {'rows':>8} {'predict (us)':>14} {'top-5 (us)':>12}")
+    for num_categories in args.categories:
+        result = benchmark(num_categories, args.samples, args.calls, rng, args.mode)
+        print(
+            f"{result['categories']:>10} "
+            f"{result['rows']:>8} "
+            f"{result['predict_us']:>14.1f} "
+            f"{result['top_k_us']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark for categorizer training throughput
+Fills a throwaway SQLite database with synthetic transactions and times
+CategorizationService.train_ml_model, reporting rows/s and optionally peak Python memory
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_tmp_dir = Path(tempfile.mkdtemp())
+# Never the configured database: the benchmark inserts synthetic rows
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir / 'benchmark.db'}"
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.domain.services import categorization_service  # noqa: E402
+from app.domain.services.categorization_service import CategorizationService  # noqa: E402
+from app.models import Transaction  # noqa: E402
+
+
+WORDS = [
+    "coffee", "taxi", "market", "pizza", "cinema", "pharmacy", "fuel", "books",
+    "gym", "rent", "salary", "bakery", "metro", "flowers", "hotel", "airline",
+    "sushi", "burger", "grocery", "phone", "internet", "insurance", "repair", "shoes",
+]
+
+
+def populate(db, rows: int, num_categories: int, rng: random.Random):
+    """Insert synthetic categorized transactions in batches"""
+    now = datetime.utcnow()
+    batch = []
+    for i in range(rows):
+        cat_id = rng.randint(1, num_categories)
+        words = rng.sample(WORDS, 2)
+        batch.append({
+            "amount": 10,
+            "description": f"merchant{cat_id} {words[0]} {words[1]} #{i}",
+            "transaction_date": now,
+            "transaction_type": "expense",
+            "category_id": cat_id,
+        })
+        if len(batch) == 10000:
+            db.execute(Transaction.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.execute(Transaction.__table__.insert(), batch)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=settings.CATEGORIZER_TRAINING_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="Report peak Python memory (tracemalloc slows training down)"
+    )
+    args = parser.parse_args()
+
+    settings.CATEGORIZER_TRAINING_CHUNK_SIZE = args.chunk_size
+    categorization_service.model_registry.root = _tmp_dir / "models"
+    categorization_service.model_registry.clear()
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        populate(db, args.rows, args.categories, random.Random(args.seed))
+
+        service = CategorizationService(db)
+
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = service.train_ml_model()
+        elapsed = time.perf_counter() - started
+        if args.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        db.close()
+
+    if not result["success"]:
+        print(result["message"])
+        return
+    print(f"rows:        {args.rows}")
+    print(f"chunk size:  {args.chunk_size}")
+    print(f"elapsed:     {elapsed:.2f} s")
+    print(f"throughput:  {args.rows / elapsed:,.0f} rows/s")
+    if args.trace_memory:
+        print(f"peak memory: {peak / 2 ** 20:.1f} MiB (tracemalloc)")
+
+
+if __name__ == "__main__":
+    main()
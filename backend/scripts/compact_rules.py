@@ -0,0 +1,24 @@
+"""
+Merge near-duplicate categorization rules and prune stale ones now
+The API runs the same job nightly; see RULE_* settings for the thresholds.
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.domain.services.rule_compaction import RuleCompactionService  # noqa: E402
+
+
+def main():
+    db = SessionLocal()
+    try:
+        print(json.dumps(RuleCompactionService(db).compact(), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
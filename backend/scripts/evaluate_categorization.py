@@ -0,0 +1,200 @@
+"""
+Offline evaluation of CategorizationService accuracy and latency
+Generates labeled transactions with mixed Latin and Cyrillic merchants, trains
+on the older part, replays some of it as user corrections (which creates rules)
+and predicts the newer part. Reports accuracy, coverage by prediction path
+(ML, rule, "Other") and p50/p99 latency for single and batch prediction.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_tmp_dir = Path(tempfile.mkdtemp())
+# Never the configured database: the evaluation inserts synthetic rows
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir / 'evaluation.db'}"
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.domain.services import categorization_service  # noqa: E402
+from app.domain.services.categorization_service import (  # noqa: E402
+    CategorizationService,
+    SOURCE_ML,
+    SOURCE_OTHER,
+    SOURCE_RULE,
+)
+from app.models import Category, Transaction  # noqa: E402
+
+
+MERCHANTS = {
+    "Продукты": ["Pyaterochka", "Пятёрочка", "Magnit", "Магнит", "Perekrestok", "Перекрёсток", "ВкусВилл", "Auchan"],
+    "Транспорт": ["Yandex Taxi", "Яндекс Такси", "Uber", "Метро", "Citymobil", "АЗС Лукойл", "Shell"],
+    "Кафе и рестораны": ["Starbucks", "Шоколадница", "Coffee Like", "Теремок", "KFC", "Вкусно и точка", "Додо Пицца"],
+    "Покупки": ["Ozon", "Озон", "Wildberries", "IKEA", "Леруа Мерлен", "DNS", "М.Видео", "Zara", "AliExpress"],
+    "Развлечения": ["Кинопоиск", "Синема Парк", "Steam", "Боулинг Космик", "Концерт"],
+    "Счета и подписки": ["МТС", "Beeline", "Мегафон", "Ростелеком", "ЖКХ", "Мосэнергосбыт", "Spotify", "Netflix"],
+    "Здоровье": ["Аптека 36.6", "Ригла", "Apteka.ru", "Инвитро", "Горздрав"],
+    "Образование": ["Skillbox", "Coursera", "Литрес", "Stepik", "Книжный Читай-город"],
+    "Путешествия": ["Aeroflot", "Аэрофлот", "РЖД", "Booking.com", "Островок", "Отель Космос"],
+}
+# Words that show up around merchant names regardless of category
+FILLERS = ["оплата", "покупка", "payment", "card", "карта", "москва", "moscow", "спб", "онлайн", "online"]
+
+
+def add_noise(description: str, rng: random.Random) -> str:
+    """Vary case, add store numbers, filler words and the odd typo"""
+    words = description.split()
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FILLERS))
+    if rng.random() < 0.3:
+        words.append(f"#{rng.randint(1, 999)}")
+    if rng.random() < 0.15:
+        word = rng.randrange(len(words))
+        if len(words[word]) > 3:
+            position = rng.randrange(1, len(words[word]) - 1)
+            words[word] = words[word][:position] + words[word][position + 1:]
+    text = " ".join(words)
+    choice = rng.random()
+    if choice < 0.3:
+        text = text.upper()
+    elif choice < 0.6:
+        text = text.lower()
+    return text
+
+
+def generate(count: int, days: int, rng: random.Random) -> list:
+    """Return (description, category_name, date) triples sorted by date"""
+    start = datetime(2024, 1, 1)
+    names = list(MERCHANTS)
+    rows = []
+    for _ in range(count):
+        name = rng.choice(names)
+        rows.append((
+            add_noise(rng.choice(MERCHANTS[name]), rng),
+            name,
+            start + timedelta(seconds=rng.randrange(days * 86400))
+        ))
+    rows.sort(key=lambda row: row[2])
+    return rows
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="Newest share held out for testing")
+    parser.add_argument("--corrections", type=int, default=200, help="Training rows replayed as corrections")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--threshold", type=float, default=settings.SIMILARITY_THRESHOLD, help="Rule matching")
+    parser.add_argument("--ml-threshold", type=float, default=settings.ML_SIMILARITY_THRESHOLD)
+    parser.add_argument("--min-samples", type=int, default=settings.MIN_TRAINING_SAMPLES)
+    parser.add_argument("--mode", choices=["centroid", "knn"], default=settings.CATEGORIZER_MODE)
+    parser.add_argument("--cache", action="store_true", help="Keep the prediction cache enabled")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    settings.SIMILARITY_THRESHOLD = args.threshold
+    settings.ML_SIMILARITY_THRESHOLD = args.ml_threshold
+    settings.MIN_TRAINING_SAMPLES = args.min_samples
+    settings.CATEGORIZER_MODE = args.mode
+    categorization_service.model_registry.root = _tmp_dir / "models"
+    categorization_service.model_registry.clear()
+    if not args.cache:
+        categorization_service.prediction_cache.max_size = 0
+
+    rng = random.Random(args.seed)
+    rows = generate(args.transactions, args.days, rng)
+    split = int(len(rows) * (1 - args.test_fraction))
+    train_rows, test_rows = rows[:split], rows[split:]
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        categories = {name: Category(name=name) for name in [*MERCHANTS, "Other"]}
+        db.add_all(categories.values())
+        db.commit()
+        category_ids = {name: category.id for name, category in categories.items()}
+
+        db.execute(Transaction.__table__.insert(), [
+            {
+                "amount": 100,
+                "description": description,
+                "transaction_date": date,
+                "transaction_type": "expense",
+                "category_id": category_ids[name],
+            }
+            for description, name, date in train_rows
+        ])
+        db.commit()
+
+        service = CategorizationService(db)
+        started = time.perf_counter()
+        result = service.train_ml_model()
+        train_seconds = time.perf_counter() - started
+        if not result["success"]:
+            print(result["message"])
+            return
+
+        stored = db.query(Transaction.id, Transaction.description, Transaction.category_id).all()
+        for transaction_id, description, category_id in rng.sample(stored, min(args.corrections, len(stored))):
+            service.learn_from_correction(transaction_id, category_id, category_id, description)
+
+        service = CategorizationService(db)
+        descriptions = [description for description, _, _ in test_rows]
+        expected = [category_ids[name] for _, name, _ in test_rows]
+
+        single_latencies = []
+        predictions = []
+        for description in descriptions:
+            started = time.perf_counter()
+            predictions.extend(service.predict_categories_detailed([description]))
+            single_latencies.append(time.perf_counter() - started)
+
+        batch_latencies = []
+        for start in range(0, len(descriptions), args.batch_size):
+            batch = descriptions[start:start + args.batch_size]
+            started = time.perf_counter()
+            service.predict_categories_detailed(batch)
+            batch_latencies.append(time.perf_counter() - started)
+    finally:
+        db.close()
+
+    correct = Counter()
+    by_source = Counter()
+    for prediction, category_id in zip(predictions, expected):
+        by_source[prediction.source] += 1
+        if prediction.category_id == category_id:
+            correct[prediction.source] += 1
+
+    total = len(predictions)
+    print(f"train rows:  {len(train_rows)} ({train_seconds:.2f} s), test rows: {total}")
+    print(f"mode: {args.mode}, threshold: {args.threshold}, ml threshold: {args.ml_threshold}, min samples: {args.min_samples}, "
+          f"corrections: {args.corrections}")
+    print(f"accuracy:    {sum(correct.values()) / total:.3f}")
+    print(f"{'path':>8} {'coverage':>9} {'accuracy':>9}")
+    for source in (SOURCE_ML, SOURCE_RULE, SOURCE_OTHER):
+        covered = by_source[source]
+        accuracy = f"{correct[source] / covered:.3f}" if covered else "-"
+        print(f"{source:>8} {covered / total:>9.3f} {accuracy:>9}")
+    print(f"single:      p50 {percentile(single_latencies, 0.5) * 1e3:.3f} ms, "
+          f"p99 {percentile(single_latencies, 0.99) * 1e3:.3f} ms")
+    print(f"batch of {args.batch_size}: p50 {percentile(batch_latencies, 0.5) * 1e3:.3f} ms, "
+          f"p99 {percentile(batch_latencies, 0.99) * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Recompute the daily aggregates behind the statistics endpoints from transactions
+With --check nothing is written; every day whose stored totals differ from
+the transactions is printed and the exit status is 1 if there are any.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.domain.services.daily_aggregates import find_drift, rebuild_daily_aggregates  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, help="Only this user's aggregates (default: everyone)")
+    parser.add_argument("--check", action="store_true", help="Compare with transactions instead of rebuilding")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.check:
+            drift = find_drift(db, args.user_id)
+            for row in drift:
+                print(json.dumps(row, default=str))
+            print(f"{len(drift)} aggregate rows differ from transactions")
+            sys.exit(1 if drift else 0)
+
+        rows = rebuild_daily_aggregates(db, args.user_id)
+        db.commit()
+        print(f"Wrote {rows} aggregate rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Fixtures shared by the backend tests
+
+Settings are read when app.core.config is imported, so the environment is
+filled in first. Every test gets its own SQLite database.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Never the configured database, which may be a real one
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'test.db'}"
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["AUTO_CATEGORIZATION_ENABLED"] = "false"
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.database import Base  # noqa: E402
+from app.domain.services import categorization_service  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    
+    @event.listens_for(engine, "connect")
+    def enable_foreign_keys(connection, _):
+        connection.execute("PRAGMA foreign_keys=ON")
+    
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine, tmp_path):
+    # Models trained or corrected by a test stay out of app/domain/ml/models
+    model_root = categorization_service.model_registry.root
+    categorization_service.model_registry.root = tmp_path / "models"
+    categorization_service.model_registry.clear()
+    categorization_service.prediction_cache.clear()
+    
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    categorization_service.model_registry.clear()
+    categorization_service.model_registry.root = model_root
+
+
+@pytest.fixture
+def user(db):
+    user = User(email="test@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def statement_counter(engine):
+    """
+    List of the SQL statements executed on the engine while the test runs
+    """
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,20 @@
+from sqlalchemy.dialects import postgresql
+
+from app.domain.services.auto_categorization import _values_update
+
+
+def test_postgres_update_types_all_null_columns():
+    # Nothing matched and there is no "Other" category
+    predictions = [
+        (1, None, None, 0.0, "other", None),
+        (2, None, None, 0.0, "other", None),
+    ]
+    
+    sql = str(_values_update(predictions).compile(
+        dialect=postgresql.dialect(),
+        compile_kwargs={"literal_binds": True}
+    ))
+    
+    assert "(VALUES (1, NULL, NULL, 0.0, 'other', NULL), (2, NULL, NULL, 0.0, 'other', NULL)) AS predicted" in sql
+    assert "category_id=CAST(predicted.category_id AS INTEGER)" in sql
+    assert "predicted_category_id=CAST(predicted.predicted_category_id AS INTEGER)" in sql
@@ -0,0 +1,121 @@
+from datetime import datetime
+from decimal import Decimal
+
+from app.domain.services import categorization_service
+from app.domain.services.categorization_service import CategorizationService
+from app.domain.services.rule_usage import RuleUsageCounter
+from app.domain.services.transaction_service import TransactionService
+from app.models import CategorizationRule, Category, Transaction, UserCorrection
+from app.schemas.transaction import TransactionCreate, TransactionUpdate
+
+
+def _predicted(db, service, user_id, category_id):
+    """A transaction auto-categorized into category_id"""
+    transaction = service.create_transaction(TransactionCreate(
+        amount=Decimal("10"),
+        description="coffee",
+        transaction_date=datetime(2024, 3, 1, 12),
+        category_id=category_id
+    ), user_id)
+    db.query(Transaction).filter(Transaction.id == transaction.id).update({
+        Transaction.prediction_source: "ml",
+        Transaction.predicted_category_id: category_id,
+        Transaction.model_version: "global/v1"
+    })
+    db.commit()
+    return transaction.id
+
+
+def test_update_records_corrections_of_predictions_only(db, user):
+    food, cafe = Category(name="Food"), Category(name="Cafe")
+    db.add_all([food, cafe])
+    db.commit()
+    user_id, food_id, cafe_id = user.id, food.id, cafe.id
+    service = TransactionService(db)
+    transaction_id = _predicted(db, service, user_id, food_id)
+    manual = service.create_transaction(TransactionCreate(
+        amount=Decimal("5"),
+        description="tea",
+        transaction_date=datetime(2024, 3, 1, 12),
+        category_id=food_id
+    ), user_id)
+    
+    service.update_transaction(manual.id, TransactionUpdate(category_id=cafe_id), user_id)
+    service.update_transaction(transaction_id, TransactionUpdate(category_id=food_id), user_id)
+    assert db.query(UserCorrection).count() == 0
+    
+    service.update_transaction(transaction_id, TransactionUpdate(category_id=cafe_id), user_id)
+    # Moving it back to the prediction is not a correction
+    service.update_transaction(transaction_id, TransactionUpdate(category_id=food_id), user_id)
+    
+    corrections = db.query(UserCorrection.transaction_id, UserCorrection.old_category_id,
+                           UserCorrection.new_category_id).all()
+    assert corrections == [(transaction_id, food_id, cafe_id)]
+
+
+def test_precision_ignores_corrections_of_uncategorized_transactions(db, user):
+    food, cafe = Category(name="Food"), Category(name="Cafe")
+    db.add_all([food, cafe])
+    db.commit()
+    user_id, food_id, cafe_id = user.id, food.id, cafe.id
+    service = TransactionService(db)
+    corrected = _predicted(db, service, user_id, food_id)
+    _predicted(db, service, user_id, food_id)
+    
+    service.update_transaction(corrected, TransactionUpdate(category_id=cafe_id), user_id)
+    [row] = CategorizationService(db, user_id).get_prediction_precision()
+    assert (row["evaluated"], row["corrected"], row["precision"]) == (2, 1, 0.5)
+    
+    service.update_transaction(corrected, TransactionUpdate(category_id=None), user_id)
+    [row] = CategorizationService(db, user_id).get_prediction_precision()
+    assert (row["evaluated"], row["corrected"], row["precision"]) == (1, 0, 1.0)
+
+
+def test_test_predictions_leave_rule_usage_alone(db, user, monkeypatch):
+    monkeypatch.setattr(categorization_service, "rule_usage", RuleUsageCounter())
+    cafe = Category(name="Cafe")
+    db.add(cafe)
+    db.commit()
+    transaction = TransactionService(db).create_transaction(TransactionCreate(
+        amount=Decimal("5"),
+        description="Coffee Like",
+        transaction_date=datetime(2024, 3, 1, 12)
+    ), user.id)
+    service = CategorizationService(db, user.id)
+    service.learn_from_correction(transaction.id, None, cafe.id, "Coffee Like")
+    
+    assert service.predict_categories(["coffee like"], record_usage=False) == [cafe.id]
+    assert categorization_service.rule_usage.get_stats()["pending_hits"] == 0
+    
+    assert service.predict_categories(["coffee like"]) == [cafe.id]
+    assert categorization_service.rule_usage.get_stats()["pending_hits"] == 1
+
+
+def test_bulk_categorize_learns_rules(db, user):
+    cafe = Category(name="Cafe")
+    db.add(cafe)
+    db.commit()
+    user_id, cafe_id = user.id, cafe.id
+    service = TransactionService(db)
+    ids = [
+        service.create_transaction(TransactionCreate(
+            amount=Decimal("5"),
+            description=description,
+            transaction_date=datetime(2024, 3, 1, 12)
+        ), user_id).id
+        for description in ["Coffee Like", "coffee like", "COFFEE LIKE", "Starbucks"]
+    ]
+    
+    assert service.bulk_categorize(cafe_id, ids, user_id) == 4
+    CategorizationService(db, user_id).learn_from_correction(ids[0], cafe_id, cafe_id, "Coffee Like")
+    
+    rules = db.query(
+        CategorizationRule.pattern,
+        CategorizationRule.category_id,
+        CategorizationRule.times_correct,
+        CategorizationRule.confidence
+    ).order_by(CategorizationRule.pattern).all()
+    assert rules == [("coffee like", cafe_id, 4, 1.0), ("starbucks", cafe_id, 1, 1.0)]
+    # Only the direct correction is logged: none of the moved rows was predicted
+    assert db.query(UserCorrection).count() == 1
+    assert CategorizationService(db, user_id).predict_categories(["Starbucks"]) == [cafe_id]
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.domain.ml.categorizer import MLCategorizer
+
+TRAINING = [
+    ("yandex taxi ride", 1), ("uber taxi", 1), ("city taxi order", 1),
+    ("pyaterochka groceries", 2), ("magnit groceries", 2), ("auchan groceries", 2),
+    ("starbucks coffee", 3), ("coffee like", 3), ("costa coffee", 3),
+]
+QUERIES = ["taxi", "groceries store", "coffee", "cinema tickets", "metro card", "cinema coffee"]
+
+
+def _train(tmp_path, mode):
+    model = MLCategorizer(min_samples=3, mode=mode, model_path=tmp_path, compact_every=1000)
+    assert model.train([
+        SimpleNamespace(description=description, category_id=category_id)
+        for description, category_id in TRAINING
+    ])
+    return model
+
+
+def _rebuilt(model):
+    """Predictions of the same model after a full rebuild, with the same IDF weights"""
+    with model._lock:
+        model._build_scoring_matrices()
+    return [model.predict_top_k(query, k=3) for query in QUERIES]
+
+
+@pytest.mark.parametrize("mode", ["centroid", "knn"])
+def test_corrections_score_like_a_full_rebuild(tmp_path, mode):
+    model = _train(tmp_path, mode)
+    model.update_with_correction("metro card top up", 1)
+    # Category 4 becomes active with its third correction
+    for description in ["cinema tickets", "imax cinema", "cinema park"]:
+        model.update_with_correction(description, 4)
+        model.predict("cinema")
+    model.update_with_correction("coffee and cinema", 4)
+    
+    incremental = [model.predict_top_k(query, k=3) for query in QUERIES]
+    
+    assert incremental[QUERIES.index("cinema tickets")][0][0] == 4
+    assert incremental == _rebuilt(model)
+    if mode == "knn":
+        assert model.get_stats()["indexed_documents"] == len(TRAINING) + 5
+
+
+def test_knn_tail_is_merged_on_compaction(tmp_path):
+    model = _train(tmp_path, "knn")
+    for description in ["metro card", "metro ride"]:
+        model.update_with_correction(description, 1)
+        model.predict("metro")
+    assert len(model.knn_tail_labels) == 2
+    
+    model.compact()
+    
+    assert len(model.knn_tail_labels) == 0
+    assert len(model.knn_labels) == len(TRAINING) + 2
+    reloaded = MLCategorizer(min_samples=3, mode="knn", model_path=tmp_path)
+    assert reloaded.load_model()
+    assert [reloaded.predict_top_k(query) for query in QUERIES] == [model.predict_top_k(query) for query in QUERIES]
@@ -0,0 +1,78 @@
+from datetime import datetime
+from decimal import Decimal
+
+from app.domain.services.category_service import CategoryService
+from app.domain.services.daily_aggregates import find_drift, rebuild_daily_aggregates
+from app.domain.services.transaction_service import TransactionService
+from app.models import Category, DailyAggregate, Transaction, UserCorrection
+from app.schemas.category import CategoryUpdate
+from app.schemas.transaction import TransactionCreate, TransactionType, TransactionUpdate
+
+
+def _create(service, user_id, amount, day, category_id=None, transaction_type=TransactionType.expense):
+    return service.create_transaction(TransactionCreate(
+        amount=Decimal(amount),
+        description=f"purchase {amount}",
+        transaction_date=datetime(2024, 3, day, 12),
+        category_id=category_id,
+        transaction_type=transaction_type
+    ), user_id)
+
+
+def test_writes_keep_aggregates_in_step(db, user):
+    food, transport, parent = Category(name="Food"), Category(name="Transport"), Category(name="Living")
+    db.add_all([food, transport, parent])
+    db.commit()
+    user_id, food_id, transport_id, parent_id = user.id, food.id, transport.id, parent.id
+    service = TransactionService(db)
+    
+    first = _create(service, user_id, "100", 1, food_id)
+    second = _create(service, user_id, "40.50", 1, food_id)
+    third = _create(service, user_id, "250", 2)
+    _create(service, user_id, "1000", 2, transaction_type=TransactionType.income)
+    assert find_drift(db) == []
+    
+    service.update_transaction(first.id, TransactionUpdate(amount=Decimal("120")), user_id)
+    service.update_transaction(second.id, TransactionUpdate(
+        category_id=transport_id,
+        transaction_date=datetime(2024, 3, 5, 9)
+    ), user_id)
+    service.update_transaction(third.id, TransactionUpdate(transaction_type=TransactionType.income), user_id)
+    assert find_drift(db) == []
+    
+    service.delete_transaction(third.id, user_id)
+    assert find_drift(db) == []
+    
+    # A predicted transaction, so moving it records a correction the category delete has to drop
+    db.query(Transaction).filter(Transaction.id == second.id).update({
+        Transaction.prediction_source: "ml",
+        Transaction.predicted_category_id: transport_id
+    })
+    db.commit()
+    ids = [transaction_id for transaction_id, in db.query(Transaction.id)]
+    assert service.bulk_categorize(food_id, ids, user_id) == len(ids)
+    assert find_drift(db) == []
+    assert db.query(UserCorrection).count() == 1
+    
+    categories = CategoryService(db)
+    categories.update_category(food_id, CategoryUpdate(parent_id=parent_id))
+    assert find_drift(db) == []
+    assert categories.delete_category(food_id)
+    assert find_drift(db) == []
+    
+    assert db.query(Transaction).filter(Transaction.category_id.is_(None)).count() == len(ids)
+    assert db.query(DailyAggregate).filter(DailyAggregate.category_id == food_id).count() == 0
+    assert db.query(UserCorrection).count() == 0
+
+
+def test_rebuild_matches_transactions(db, user):
+    service = TransactionService(db)
+    _create(service, user.id, "10", 1)
+    _create(service, user.id, "20", 1)
+    db.query(DailyAggregate).delete()
+    db.commit()
+    assert find_drift(db)
+    
+    assert rebuild_daily_aggregates(db) == 1
+    db.commit()
+    assert find_drift(db) == []
@@ -0,0 +1,36 @@
+from datetime import datetime
+from decimal import Decimal
+
+from app.domain.services.statistics_service import StatisticsService
+from app.domain.services.transaction_service import TransactionService
+from app.models import Account, AccountType, Category
+from app.schemas.transaction import TransactionCreate, TransactionType
+
+
+def test_get_summary_runs_one_statement(db, user, statement_counter):
+    category = Category(name="Food")
+    db.add_all([
+        category,
+        Account(name="Card", account_type=AccountType.CHECKING, balance=Decimal("500"), user_id=user.id)
+    ])
+    db.commit()
+    service = TransactionService(db)
+    for amount, transaction_type in [("100", TransactionType.expense), ("40", TransactionType.expense),
+                                     ("1000", TransactionType.income)]:
+        service.create_transaction(TransactionCreate(
+            amount=Decimal(amount),
+            description="test",
+            transaction_date=datetime(2024, 3, 1, 12),
+            category_id=category.id,
+            transaction_type=transaction_type
+        ), user.id)
+    user_id = user.id
+    statement_counter.clear()
+    
+    summary = StatisticsService(db).get_summary(user_id)
+    
+    assert len(statement_counter) == 1
+    assert summary["expense_total"] == 140.0
+    assert summary["income_total"] == 1000.0
+    assert summary["transaction_count"] == 3
+    assert summary["total_balance"] == 500.0